@@ -19,9 +19,37 @@ Example:
 import os
 import sys
 import json
+import heapq
+import pickle
+import hashlib
 import numpy as np
 from scipy.io import loadmat, matlab
 
+# orjson parses number-heavy channel JSON much faster than the stdlib;
+# fall back to json when it isn't installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# numba is optional: when present, float diff stats run as one fused,
+# multi-threaded pass instead of several NumPy temporaries.
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# MATLAB v7.3 files are HDF5 containers that scipy can't read; h5py is only
+# needed when one of those shows up.
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+# Converted MAT structures are cached here, keyed by (path, mtime, size), so
+# repeated comparisons against the same reference skip scipy's MAT parsing
+MAT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "shimmer", "mat")
+
 # ---------------------------------------------------------------------
 # Helper functions
 # ---------------------------------------------------------------------
@@ -37,44 +65,277 @@ def matlab_to_dict(obj):
     elif isinstance(obj, np.ndarray):
         if obj.size == 1:
             return matlab_to_dict(obj.item())
-        else:
-            return [matlab_to_dict(x) for x in obj]
+        if obj.dtype.kind in "fiubc":
+            # Plain numeric arrays can't hold mat_structs; keep the buffer as-is
+            return obj
+        out = [None] * len(obj)
+        for i, x in enumerate(obj):
+            out[i] = matlab_to_dict(x)
+        return out
     else:
         return obj
 
 
 def load_json(path):
     try:
-        with open(path, "r") as f:
-            return json.load(f)
+        with open(path, "rb") as f:
+            raw = f.read()
+        if orjson is not None:
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                # shimmer_wrapper writes with json.dump, which emits NaN literals
+                # (e.g. sampleRate when the tick count is 0) that orjson rejects
+                pass
+        return json.loads(raw)
     except Exception as e:
         print(f"❌ Error loading JSON {path}: {e}")
         return None
 
 
+def _is_mat_v73(path):
+    with open(path, "rb") as f:
+        return b"MATLAB 7.3" in f.read(128)
+
+
+# MATLAB classes of numeric arrays in v7.3 files, for rebuilding empty ones
+_MAT_NUMERIC_DTYPES = {
+    b"double": np.float64, b"single": np.float32,
+    b"int8": np.int8, b"uint8": np.uint8, b"int16": np.int16, b"uint16": np.uint16,
+    b"int32": np.int32, b"uint32": np.uint32, b"int64": np.int64, b"uint64": np.uint64,
+    b"logical": np.bool_,
+}
+
+
+def _h5_to_py(f, node):
+    """Convert an h5py node from a v7.3 MAT file into the same shapes matlab_to_dict produces."""
+    if isinstance(node, h5py.Group):
+        return {k: _h5_to_py(f, node[k]) for k in node.keys() if not k.startswith("#")}
+    data = node[()]
+    mat_class = node.attrs.get("MATLAB_class", b"")
+    if node.attrs.get("MATLAB_empty", 0):
+        # Empty arrays are stored as their MATLAB dims vector, not as data
+        if mat_class == b"char":
+            return ""
+        if mat_class == b"cell":
+            return []
+        # loadmat(squeeze_me=True) hands back empties as 1-D (0,) arrays whatever
+        # their MATLAB dims, so match that rather than the recorded shape
+        return np.zeros(0, dtype=_MAT_NUMERIC_DTYPES.get(mat_class, np.float64))
+    if isinstance(data, np.ndarray) and data.dtype == h5py.ref_dtype:
+        # Cell arrays: gather every reference first, then dereference in one loop
+        refs = data.T.ravel()
+        out = [None] * refs.size
+        for i, ref in enumerate(refs):
+            out[i] = _h5_to_py(f, f[ref])
+        return out[0] if len(out) == 1 else out
+    if mat_class == b"char":
+        return "".join(map(chr, np.asarray(data).T.ravel()))
+    # HDF5 stores MATLAB's column-major data transposed; mimic squeeze_me=True
+    arr = np.squeeze(np.asarray(data).T)
+    return arr.item() if arr.size == 1 else arr
+
+
+def _load_mat_h5(path):
+    with h5py.File(path, "r") as f:
+        return {k: _h5_to_py(f, f[k]) for k in f.keys() if not k.startswith("#")}
+
+
+def _mat_cache_path(path):
+    # "<source>-<version>.pkl": the source half lets a new entry find and evict
+    # the stale versions cached for the same file
+    st = os.stat(path)
+    source = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=8).hexdigest()
+    version = hashlib.blake2b(f"{st.st_mtime_ns}|{st.st_size}".encode(), digest_size=8).hexdigest()
+    return os.path.join(MAT_CACHE_DIR, f"{source}-{version}.pkl")
+
+
+def _evict_stale_mat_cache(cache_path):
+    """Remove cache entries for the same source file other than cache_path."""
+    name = os.path.basename(cache_path)
+    source = name.partition("-")[0] + "-"
+    # .pkl first, so a half-removed entry is never mistaken for a complete one
+    stale = sorted(
+        (n for n in os.listdir(MAT_CACHE_DIR)
+         if n.startswith(source) and n.endswith((".pkl", ".bin")) and n[:-4] != name[:-4]),
+        key=lambda n: not n.endswith(".pkl"),
+    )
+    for n in stale:
+        try:
+            os.remove(os.path.join(MAT_CACHE_DIR, n))
+        except OSError:
+            pass
+
+
+def _read_mat_cache(cache_path):
+    """
+    Load a cached MAT structure. Array data lives in a sidecar .bin file and is
+    memory-mapped read-only, so only the pages a comparison touches are read.
+    """
+    try:
+        with open(cache_path, "rb") as f:
+            meta = pickle.load(f)
+        offsets, sizes = meta["offsets"], meta["sizes"]
+        buffers = []
+        if sizes:
+            mm = np.memmap(f"{cache_path[:-4]}.bin", dtype=np.uint8, mode="r")
+            buffers = [mm[off:off + n] for off, n in zip(offsets, sizes)]
+        return pickle.loads(meta["payload"], buffers=buffers)
+    except Exception:
+        # Any unreadable entry (truncated file, or classes that no longer unpickle
+        # after a numpy/scipy upgrade) just means the .mat is parsed again
+        return None
+
+
+def _write_mat_cache(cache_path, data):
+    """Best effort: a failed cache write must never fail the comparison."""
+    try:
+        os.makedirs(MAT_CACHE_DIR, exist_ok=True)
+        # Protocol 5 hands contiguous ndarray buffers to the callback instead of
+        # copying them into the pickle stream
+        buffers = []
+        payload = pickle.dumps(data, protocol=5, buffer_callback=buffers.append)
+        offsets, sizes = [], []
+        bin_path = f"{cache_path[:-4]}.bin"
+        tmp_bin = f"{bin_path}.{os.getpid()}.tmp"
+        with open(tmp_bin, "wb") as f:
+            for buf in buffers:
+                # 64-byte alignment keeps the memmapped arrays SIMD-friendly
+                pad = -f.tell() % 64
+                f.write(b"\0" * pad)
+                raw = buf.raw()
+                offsets.append(f.tell())
+                sizes.append(raw.nbytes)
+                f.write(raw)
+        os.replace(tmp_bin, bin_path)
+        # The .pkl is written last, so its presence marks a complete entry
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"offsets": offsets, "sizes": sizes, "payload": payload}, f, protocol=5)
+        os.replace(tmp_path, cache_path)
+        _evict_stale_mat_cache(cache_path)
+    except (OSError, BufferError, pickle.PicklingError) as e:
+        print(f"⚠️ Could not cache MAT {cache_path}: {e}")
+
+
 def load_mat(path):
     try:
-        data = loadmat(path, squeeze_me=True, struct_as_record=False)
-        return {k: matlab_to_dict(v) for k, v in data.items() if not k.startswith("__")}
+        cache_path = _mat_cache_path(path)
+        cached = _read_mat_cache(cache_path)
+        if cached is not None:
+            return cached
+        if _is_mat_v73(path):
+            if h5py is None:
+                raise ImportError("h5py is required to read MATLAB v7.3 files")
+            out = _load_mat_h5(path)
+        else:
+            data = loadmat(path, squeeze_me=True, struct_as_record=False)
+            out = {k: matlab_to_dict(v) for k, v in data.items() if not k.startswith("__")}
+        _write_mat_cache(cache_path, out)
+        return out
     except Exception as e:
         print(f"❌ Error loading MAT {path}: {e}")
         return None
 
 
+if njit is not None:
+    @njit(parallel=True, fastmath={"reassoc", "contract"}, cache=True)
+    def _diff_stats_jit(a, b, tol):
+        """Return (max diff, sum diff, out-of-tolerance count, NaN count)."""
+        max_d = 0.0
+        sum_d = 0.0
+        n_bad = 0
+        n_nan = 0
+        for i in prange(a.size):
+            d = abs(a[i] - b[i])
+            if d != d:
+                n_nan += 1
+                continue
+            max_d = max(max_d, d)
+            sum_d += d
+            if d > tol + tol * abs(b[i]):
+                n_bad += 1
+        return max_d, sum_d, n_bad, n_nan
+else:
+    _diff_stats_jit = None
+
+
+def _flat_views(a_arr, b_arr):
+    """
+    Flat views of two same-shape arrays in a shared memory order, or None when
+    their layouts differ. loadmat returns Fortran-ordered matrices, so both C- and
+    F-contiguous pairs qualify.
+    """
+    if a_arr.shape != b_arr.shape:
+        return None
+    if a_arr.flags.c_contiguous and b_arr.flags.c_contiguous:
+        return a_arr.ravel(order="C"), b_arr.ravel(order="C")
+    if a_arr.flags.f_contiguous and b_arr.flags.f_contiguous:
+        return a_arr.ravel(order="F"), b_arr.ravel(order="F")
+    return None
+
+
+def _bitwise_equal(a_arr, b_arr):
+    """memcmp-style check: same dtype and identical bytes (NaN payloads included)."""
+    if a_arr is b_arr:
+        return True
+    if a_arr.dtype != b_arr.dtype:
+        return False
+    flat = _flat_views(a_arr, b_arr)
+    if flat is None:
+        return False
+    return np.array_equal(flat[0].view(np.uint8), flat[1].view(np.uint8))
+
+
+def _diff_stats(a_arr, b_arr, tol):
+    """Return (within tolerance, max diff, mean diff) with np.allclose semantics."""
+    flat = (
+        _flat_views(a_arr, b_arr)
+        if _diff_stats_jit is not None
+        and a_arr.dtype == b_arr.dtype
+        and a_arr.dtype in (np.float32, np.float64)
+        else None
+    )
+    if flat is not None:
+        max_d, sum_d, n_bad, n_nan = _diff_stats_jit(flat[0], flat[1], tol)
+        # NaN/inf pairs need the equal_nan handling below
+        if not n_nan:
+            return n_bad == 0, max_d, sum_d / a_arr.size
+
+    # Single subtraction feeds the tolerance check and both reported stats
+    work_dtype = np.result_type(a_arr.dtype, b_arr.dtype, np.float64)
+    diff = np.abs(np.subtract(a_arr, b_arr, dtype=work_dtype))
+    max_d = diff.max()
+    if np.isnan(max_d):
+        # equal_nan / equal-inf semantics of np.allclose
+        same = (a_arr == b_arr) | (np.isnan(a_arr) & np.isnan(b_arr))
+        diff[np.isnan(diff) & same] = 0.0
+        max_d = diff.max()
+    # max_d <= atol already implies allclose; only fall back to the
+    # per-element rtol check when the cheap bound fails
+    ok = max_d <= tol or bool(np.all(diff <= tol + tol * np.abs(b_arr)))
+    return ok, max_d, diff.mean()
+
+
 def compare_numeric(a, b, tol=1e-6):
     """Compare numeric arrays/lists within tolerance."""
     try:
-        a_arr = np.array(a)
-        b_arr = np.array(b)
+        a_arr = np.asarray(a)
+        b_arr = np.asarray(b)
         if a_arr.shape != b_arr.shape:
             return f"❌ shape mismatch {a_arr.shape} vs {b_arr.shape}"
 
         if np.issubdtype(a_arr.dtype, np.number):
-            if np.allclose(a_arr, b_arr, atol=tol, rtol=tol, equal_nan=True):
-                return f"✅ match (max diff {np.max(np.abs(a_arr - b_arr)):.2e})"
+            if a_arr.size == 0:
+                return "✅ match (empty)"
+            # Bit-identical outputs skip the float pipeline entirely
+            if _bitwise_equal(a_arr, b_arr):
+                return "✅ exact match (bitwise)"
+            ok, max_d, mean_d = _diff_stats(a_arr, b_arr, tol)
+            if ok:
+                return f"✅ match (max diff {max_d:.2e})"
             else:
-                diff = np.abs(a_arr - b_arr)
-                return f"❌ values differ (max {np.max(diff):.2e}, mean {np.mean(diff):.2e})"
+                return f"❌ values differ (max {max_d:.2e}, mean {mean_d:.2e})"
         else:
             if np.array_equal(a_arr, b_arr):
                 return "✅ exact match"
@@ -86,8 +347,9 @@ def compare_numeric(a, b, tol=1e-6):
 
 def compare_dicts(ref_dict, cmp_dict, tol=1e-6, max_keys=30, label=""):
     """Compare two dictionaries key by key."""
-    ref_keys = set(ref_dict.keys())
-    cmp_keys = set(cmp_dict.keys())
+    # Set operations directly on the key views, no intermediate sets
+    ref_keys = ref_dict.keys()
+    cmp_keys = cmp_dict.keys()
     common = ref_keys & cmp_keys
     only_ref = ref_keys - cmp_keys
     only_cmp = cmp_keys - ref_keys
@@ -96,25 +358,29 @@ def compare_dicts(ref_dict, cmp_dict, tol=1e-6, max_keys=30, label=""):
     print(f"  Shared keys: {len(common)}, Ref-only: {len(only_ref)}, Cmp-only: {len(only_cmp)}")
 
     if only_ref:
-        print(f"  ⚠️ Keys only in reference: {sorted(list(only_ref))[:max_keys]}")
+        print(f"  ⚠️ Keys only in reference: {heapq.nsmallest(max_keys, only_ref)}")
     if only_cmp:
-        print(f"  ⚠️ Keys only in compare:   {sorted(list(only_cmp))[:max_keys]}")
+        print(f"  ⚠️ Keys only in compare:   {heapq.nsmallest(max_keys, only_cmp)}")
 
-    results = []
-    for key in sorted(common):
+    # Compare in any order; only the displayed preview needs sorting
+    results = [None] * len(common)
+    for i, key in enumerate(common):
         a = ref_dict[key]
         b = cmp_dict[key]
         if isinstance(a, (list, np.ndarray)) and isinstance(b, (list, np.ndarray)):
             result = compare_numeric(a, b, tol)
         elif isinstance(a, dict) and isinstance(b, dict):
-            sub_keys = set(a.keys()) & set(b.keys())
+            sub_keys = a.keys() & b.keys()
             result = f"{len(sub_keys)} subkeys compared"
+        elif isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+            # Array vs scalar/dict: == would broadcast into an array of bools
+            result = "✅ identical" if np.array_equal(a, b) else f"❌ differ ({a} vs {b})"
         else:
             result = "✅ identical" if a == b else f"❌ differ ({a} vs {b})"
-        results.append((key, result))
+        results[i] = (key, result)
 
     print("\n🔍 Detailed comparison (first few keys):")
-    for k, r in results[:max_keys]:
+    for k, r in heapq.nsmallest(max_keys, results, key=lambda kr: kr[0]):
         print(f"   {k:<25} {r}")
 
     diffs = [r for _, r in results if r.startswith("❌")]
@@ -1,13 +1,24 @@
 import os
+import re
+import functools
+from bisect import bisect_left
 from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Body, Path
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import io
 import zipfile
 import boto3
+from boto3.dynamodb.conditions import Attr, ConditionBase, ConditionExpressionBuilder, Key
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
-from typing import List, Optional, Dict
-from collections import defaultdict
+from typing import Any, List, NamedTuple, Optional, Dict
+from collections import defaultdict, deque
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, local
+from time import monotonic, sleep, time as wall_time
 import json
 import traceback
 
@@ -23,6 +34,8 @@ from datetime import datetime, timezone
 from decimal import Decimal
 from fastapi import Request
 import struct
+import sys
+from array import array
 from shimmerCaliberate import read_shimmer_dat
 
 # Load environment variables from .env if present
@@ -32,8 +45,81 @@ load_dotenv()
 # Only S3_BUCKET should be loaded from environment variables.
 S3_BUCKET = os.getenv("S3_BUCKET")
 
-# Use default boto3 session (credentials and region are handled by Lambda)
-s3_client = boto3.client("s3")
+# Shared client config: a connection pool large enough for the threaded S3/DynamoDB
+# fan-out and TCP keep-alive so warm containers keep reusing signed connections
+BOTO_CONFIG = Config(
+    max_pool_connections=64,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
+
+# One explicit session shared by every client (credentials and region are handled by Lambda)
+boto_session = boto3.Session()
+s3_client = boto_session.client("s3", config=BOTO_CONFIG)
+# Building DynamoDB clients/resources loads and parses service models. Do it on first
+# use so cold starts that only touch S3 skip that cost. Clients are thread-safe and
+# shared; resources (and their Table handles) are not, so each thread gets its own
+_ddb_client = None
+_ddb_local = local()
+# Creating clients or resources from one session is not thread-safe either
+_ddb_session_lock = Lock()
+
+
+def _get_ddb_client():
+    """Return the shared low-level DynamoDB client (safe to use from any thread)."""
+    global _ddb_client
+    if _ddb_client is None:
+        with _ddb_session_lock:
+            if _ddb_client is None:
+                _ddb_client = boto_session.client("dynamodb", config=BOTO_CONFIG)
+    return _ddb_client
+
+
+def _get_ddb_resource():
+    """Return this thread's DynamoDB resource."""
+    resource = getattr(_ddb_local, "resource", None)
+    if resource is None:
+        with _ddb_session_lock:
+            resource = _ddb_local.resource = boto_session.resource("dynamodb", config=BOTO_CONFIG)
+    return resource
+
+# Routes with a response_model are serialized by FastAPI through Pydantic. The few
+# endpoints that return large plain lists directly use RawJSONResponse, which renders
+# with orjson when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class RawJSONResponse(JSONResponse):
+    """JSONResponse for already-plain content (e.g. lists of keys), via orjson if available."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return super().render(content)
+
+
+def _json_dumps(obj) -> bytes:
+    """
+    Encode obj as compact JSON bytes for storage. Always the stdlib encoder: it
+    writes NaN as the NaN literal (as stored documents always have, and as the
+    binary per-field objects keep it), where orjson would silently write null.
+    """
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(data: bytes):
+    """Parse JSON bytes, with orjson when it is available."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Documents written by json.dumps may hold NaN literals, which orjson
+            # rejects (e.g. sampleRate when the tick count was 0)
+            pass
+    return json.loads(data)
 
 app = FastAPI()
 
@@ -46,15 +132,369 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-class FileItem(BaseModel):
+# ---------------------- S3 helpers ----------------------
+
+# S3 multipart parts must be at least 5 MiB (except the last one)
+S3_PART_SIZE = 8 * 1024 * 1024
+# Concurrent GetObject calls when pulling many objects (boto3 clients are thread-safe)
+S3_GET_WORKERS = 16
+# Objects up to this size are prefetched whole; bigger ones are streamed in
+# S3_COPY_CHUNK_SIZE reads so memory stays bounded by the worker count
+S3_PREFETCH_MAX_BYTES = 8 * 1024 * 1024
+S3_COPY_CHUNK_SIZE = 1024 * 1024
+# Existence checks for up to this many names use concurrent HeadObject calls;
+# larger batches are cheaper to answer from one bucket listing
+S3_HEAD_PROBE_MAX = 200
+# HEAD responses carry no body, so more of them can share the connection pool
+S3_HEAD_WORKERS = 32
+
+# Presigned upload/download URLs are valid for an hour. Identical requests reuse
+# the same URL within a refresh window, so every URL handed out still has at
+# least S3_PRESIGN_EXPIRES - S3_PRESIGN_REFRESH seconds left
+S3_PRESIGN_EXPIRES = 3600
+S3_PRESIGN_REFRESH = 1800
+
+# Sensor .txt payloads compress well; level 1 deflate gets most of the size win
+# at a fraction of the default level-6 CPU cost
+ZIP_COMPRESSION = zipfile.ZIP_DEFLATED
+ZIP_COMPRESSLEVEL = 1
+
+
+# ListObjectsV2 returns keys in UTF-8 byte order, so the keyspace past the first
+# page can be cut at fixed boundaries: range i holds keys in (boundary[i-1], boundary[i]]
+S3_LIST_BOUNDARIES = ("0", "4", "8", "C", "G", "K", "O", "S", "W", "c", "g", "k", "o", "s", "w")
+
+# Bucket listings are reused for this many seconds so bursts of requests share one scan
+S3_LIST_CACHE_TTL = 10.0
+
+_list_cache_lock = Lock()
+_list_cache: Dict[str, Any] = {"expires_at": 0.0, "keys": [], "key_set": frozenset()}
+
+
+# Paginators are stateless between paginate() calls, so one is shared by every listing
+_list_paginator = s3_client.get_paginator("list_objects_v2")
+
+
+def _iter_list_pages(prefix: str = ""):
+    """Yield each ListObjectsV2 page of the bucket, optionally limited to a key prefix."""
+    return _list_paginator.paginate(Bucket=S3_BUCKET, Prefix=prefix, PaginationConfig={"PageSize": 1000})
+
+
+def _list_key_range(start_after: Optional[str], end: Optional[str]) -> List[str]:
+    """
+    Return the keys with start_after < Key <= end (None = unbounded). Only Key is
+    kept; the per-object ETag/Size/LastModified/StorageClass are never used.
+    """
+    kwargs: Dict[str, Any] = {"Bucket": S3_BUCKET, "PaginationConfig": {"PageSize": 1000}}
+    if start_after is not None:
+        kwargs["StartAfter"] = start_after
+    keys: List[str] = []
+    for page in _list_paginator.paginate(**kwargs):
+        page_keys = [obj["Key"] for obj in page.get("Contents", ())]
+        if end is not None and page_keys and page_keys[-1] > end:
+            keys.extend(k for k in page_keys if k <= end)
+            break
+        keys.extend(page_keys)
+    return keys
+
+
+def _list_bucket_keys() -> List[str]:
+    """
+    Return every key in the bucket, in key order. The first page is fetched
+    unbounded, so buckets of up to 1000 keys cost a single call. Only when it is
+    truncated is the rest of the keyspace, from the last key returned onwards,
+    split at the S3_LIST_BOUNDARIES above that key and paginated one range per thread.
+    """
+    resp = s3_client.list_objects_v2(Bucket=S3_BUCKET, MaxKeys=1000)
+    keys = [obj["Key"] for obj in resp.get("Contents", ())]
+    if not resp.get("IsTruncated") or not keys:
+        return keys
+    last = keys[-1]
+    bounds = [b for b in S3_LIST_BOUNDARIES if b > last]
+    lower = (last, *bounds)
+    upper = (*bounds, None)
+    with ThreadPoolExecutor(max_workers=len(lower)) as ex:
+        parts = ex.map(_list_key_range, lower, upper)
+        keys.extend(key for part in parts for key in part)
+    return keys
+
+
+def _peek_listing():
+    """Return the cached key set if it is still fresh, else None (never lists)."""
+    with _list_cache_lock:
+        if monotonic() < _list_cache["expires_at"]:
+            return _list_cache["key_set"]
+    return None
+
+
+def _cached_listing():
+    """
+    Return (sorted key list, key set) for the whole bucket, cached for
+    S3_LIST_CACHE_TTL seconds. Callers must treat both as read-only.
+    """
+    with _list_cache_lock:
+        if monotonic() < _list_cache["expires_at"]:
+            return _list_cache["keys"], _list_cache["key_set"]
+    keys = _list_bucket_keys()
+    key_set = frozenset(keys)
+    with _list_cache_lock:
+        _list_cache.update(expires_at=monotonic() + S3_LIST_CACHE_TTL, keys=keys, key_set=key_set)
+    return keys, key_set
+
+
+def _list_prefix(prefix: str) -> List[str]:
+    """
+    Return the sorted keys starting with prefix: a bisect into the cached listing
+    when it is fresh, otherwise a ListObjectsV2 walk of just that prefix.
+    """
+    with _list_cache_lock:
+        keys = _list_cache["keys"] if monotonic() < _list_cache["expires_at"] else None
+    if keys is None:
+        return [obj["Key"] for page in _iter_list_pages(prefix) for obj in page.get("Contents", ())]
+    # S3's UTF-8 byte order matches Python's code point order
+    matched: List[str] = []
+    for i in range(bisect_left(keys, prefix), len(keys)):
+        if not keys[i].startswith(prefix):
+            break
+        matched.append(keys[i])
+    return matched
+
+
+def _invalidate_listing():
+    """Drop the cached bucket listing after this process writes to the bucket."""
+    with _list_cache_lock:
+        _list_cache["expires_at"] = 0.0
+
+
+@functools.lru_cache(maxsize=4096)
+def _presign_cached(client_method: str, key: str, tagging: Optional[str], window: int) -> str:
+    params = {"Bucket": S3_BUCKET, "Key": key}
+    if tagging:
+        params["Tagging"] = tagging
+    return s3_client.generate_presigned_url(
+        ClientMethod=client_method,
+        Params=params,
+        ExpiresIn=S3_PRESIGN_EXPIRES
+    )
+
+
+def _presign(client_method: str, key: str, tagging: Optional[str] = None) -> str:
+    """Return a presigned URL for key, reusing the one signed earlier in this refresh window."""
+    return _presign_cached(client_method, key, tagging, int(wall_time()) // S3_PRESIGN_REFRESH)
+
+
+def _s3_key_exists(key: str) -> bool:
+    try:
+        s3_client.head_object(Bucket=S3_BUCKET, Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+
+def _s3_body_result(key: str, fut):
+    try:
+        return fut.result()
+    except ClientError as e:
+        # S3 names the key only for NoSuchKey; record it for every error so callers can report it
+        e.response.setdefault("Error", {}).setdefault("Key", key)
+        raise
+
+
+def _iter_s3_bodies(keys, max_workers: int = S3_GET_WORKERS):
+    """
+    Yield (key, body) for each key, in order, while fetching up to max_workers
+    objects concurrently. Bodies up to S3_PREFETCH_MAX_BYTES arrive as bytes; larger
+    ones are returned as the unread StreamingBody so the consumer can copy them in
+    chunks. Either way at most max_workers objects are in flight.
+    """
+    def fetch(key):
+        resp = s3_client.get_object(Bucket=S3_BUCKET, Key=key)
+        if resp.get("ContentLength", 0) <= S3_PREFETCH_MAX_BYTES:
+            return resp["Body"].read()
+        return resp["Body"]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        pending = deque()
+        for key in keys:
+            pending.append((key, ex.submit(fetch, key)))
+            if len(pending) >= max_workers:
+                k, fut = pending.popleft()
+                yield k, _s3_body_result(k, fut)
+        while pending:
+            k, fut = pending.popleft()
+            yield k, _s3_body_result(k, fut)
+
+
+def _iter_zip(out, keys, compression: int = ZIP_COMPRESSION, compresslevel: Optional[int] = ZIP_COMPRESSLEVEL):
+    """
+    Write a ZIP of the given S3 keys to the file object out, yielding after each
+    member (and after each chunk of a large member) so the caller can drain out
+    as the archive grows. Exhaust the generator to finish the archive.
+    """
+    with zipfile.ZipFile(out, "w", compression, compresslevel=compresslevel, allowZip64=True) as zipf:
+        for key, body in _iter_s3_bodies(keys):
+            if isinstance(body, bytes):
+                zipf.writestr(key, body)
+                yield
+                continue
+            # Streamed entries can't be patched afterwards, so always reserve ZIP64 sizes
+            with zipf.open(key, "w", force_zip64=True) as dest:
+                while True:
+                    chunk = body.read(S3_COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    yield
+    # Central directory
+    yield
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that buffers writes until drain() hands them out."""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def write(self, b):
+        view = memoryview(b)
+        self._buf += view
+        self._pos += view.nbytes
+        return view.nbytes
+
+    def drain(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def _stream_zip(keys):
+    """Yield the bytes of a ZIP of the given S3 keys as it is built."""
+    sink = _ChunkSink()
+    for _ in _iter_zip(sink, keys):
+        data = sink.drain()
+        if data:
+            yield data
+
+
+class _S3MultipartWriter(io.RawIOBase):
+    """
+    Write-only file object that streams everything written to it into an S3 key
+    using a multipart upload. Only one part is buffered at a time, so building a
+    ZIP on top of it keeps memory bounded regardless of the archive size.
+    Use as a context manager: the upload is completed on a clean exit and
+    aborted if an exception escapes.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._buf = bytearray()
+        self._pos = 0
+        self._parts: List[Dict] = []
+        self._upload_id = s3_client.create_multipart_upload(Bucket=S3_BUCKET, Key=key)["UploadId"]
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def write(self, b):
+        view = memoryview(b)
+        self._buf += view
+        self._pos += view.nbytes
+        while len(self._buf) >= S3_PART_SIZE:
+            self._upload_part(bytes(self._buf[:S3_PART_SIZE]))
+            del self._buf[:S3_PART_SIZE]
+        return view.nbytes
+
+    def _upload_part(self, data: bytes):
+        part_number = len(self._parts) + 1
+        resp = s3_client.upload_part(
+            Bucket=S3_BUCKET,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        self._parts.append({"ETag": resp["ETag"], "PartNumber": part_number})
+
+    def complete(self):
+        if self._buf or not self._parts:
+            self._upload_part(bytes(self._buf))
+            self._buf.clear()
+        s3_client.complete_multipart_upload(
+            Bucket=S3_BUCKET,
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+        _invalidate_listing()
+
+    def abort(self):
+        s3_client.abort_multipart_upload(Bucket=S3_BUCKET, Key=self.key, UploadId=self._upload_id)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.complete()
+        else:
+            try:
+                self.abort()
+            except (BotoCoreError, ClientError):
+                pass
+        return super().__exit__(exc_type, exc, tb)
+
+
+class FileItem(NamedTuple):
+    # Only used internally while grouping listings, one per key, so a tuple
+    # (no per-instance __dict__, no validation) rather than a Pydantic model
     name: str
     device: str
     date: str  # YYYY-MM-DD
     time: str  # HH:MM:SS
-    part: Optional[str] = None
     ext: str
+    part: Optional[str] = None
     patient: Optional[str] = None
 
+def _construct(model_cls, **fields):
+    """
+    Build a model from data we've already parsed without re-running validation
+    (response_model still validates the final output). Pydantic v2 renamed
+    construct() to model_construct().
+    """
+    if hasattr(model_cls, "model_construct"):
+        return model_cls.model_construct(**fields)
+    return model_cls.construct(**fields)
+
+def _keys_by_date() -> Dict[str, List[str]]:
+    """
+    Return {YYYY-MM-DD: keys} for the cached bucket listing. Keys are named by
+    device first, so S3 can't filter by date server-side; instead the index is
+    built once per listing refresh and shared by the by-day endpoints.
+    """
+    keys, _ = _cached_listing()
+    with _list_cache_lock:
+        cached = _list_cache.get("by_date")
+        if cached is not None and cached[0] is keys:
+            return cached[1]
+    by_date: Dict[str, List[str]] = defaultdict(list)
+    for key in keys:
+        day = parse_file_name(key).date
+        if day:
+            by_date[day].append(key)
+    by_date = dict(by_date)
+    with _list_cache_lock:
+        _list_cache["by_date"] = (keys, by_date)
+    return by_date
+
 class DayFiles(BaseModel):
     date: str
     files: List[str]
@@ -67,15 +507,12 @@ def list_files_by_day():
     Returns files grouped by date, each with a list of filenames for that day.
     """
     try:
-        response = s3_client.list_objects_v2(Bucket=S3_BUCKET)
-        contents = response.get("Contents", [])
-        files_by_day = defaultdict(list)
-        for obj in contents:
-            key = obj["Key"]
-            fi = parse_file_name(key)
-            if fi.date:
-                files_by_day[fi.date].append(fi.name)
-        result = [DayFiles(date=day, files=sorted(files)) for day, files in sorted(files_by_day.items())]
+        by_date = _keys_by_date()
+        # Sort the date strings alone rather than (date, key list) tuples
+        result = [
+            DayFiles(date=day, files=sorted(parse_file_name(key).name for key in by_date[day]))
+            for day in sorted(by_date)
+        ]
         return result
     except (BotoCoreError, ClientError) as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -88,25 +525,14 @@ def download_zip_by_day(date: str = Body(..., embed=True)):
     Body: { "date": "YYYY-MM-DD" }
     """
     try:
-        response = s3_client.list_objects_v2(Bucket=S3_BUCKET)
-        contents = response.get("Contents", [])
-        selected_keys = []
-        for obj in contents:
-            key = obj["Key"]
-            fi = parse_file_name(key)
-            if fi.date == date:
-                selected_keys.append(key)
+        selected_keys = _keys_by_date().get(date)
         if not selected_keys:
             raise HTTPException(status_code=404, detail="No files found for this date.")
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w") as zipf:
-            for key in selected_keys:
-                s3_obj = s3_client.get_object(Bucket=S3_BUCKET, Key=key)
-                file_bytes = s3_obj["Body"].read()
-                zipf.writestr(key, file_bytes)
-        zip_buffer.seek(0)
         zip_key = f"{date}_files.zip"
-        s3_client.upload_fileobj(zip_buffer, S3_BUCKET, zip_key)
+        # Stream the ZIP to S3 part by part instead of buffering it in memory
+        with _S3MultipartWriter(zip_key) as out:
+            for _ in _iter_zip(out, selected_keys):
+                pass
         url = s3_client.generate_presigned_url(
             ClientMethod="get_object",
             Params={"Bucket": S3_BUCKET, "Key": zip_key},
@@ -123,39 +549,127 @@ class DevicePatientRecord(BaseModel):
     shimmer2: Optional[str] = None
     updatedAt: Optional[str] = None
 
+# device_YYYYMMDD_HHMMSS_part.ext, parsed leniently: any missing or short
+# segment just leaves the corresponding field empty (same as the old slicing)
+_FILE_NAME_RE = re.compile(
+    r"(?=(?:.*\.(?P<ext>[^.]*)\Z)?)"  # extension = text after the last dot
+    r"(?P<device>[^_]*)"
+    r"(?:_(?:(?P<yyyy>[^_]{4})(?P<mm>[^_]{2})(?P<dd>[^_]{2}))?[^_]*"
+    r"(?:_(?:(?P<hh>[^_]{2})(?P<mi>[^_]{2})(?P<ss>[^_]{2}))?[^_]*"
+    r"(?:_(?P<part>[^.]*)(?P<rest>.*))?)?)?",
+    re.DOTALL,
+)
+
+@functools.lru_cache(maxsize=20000)
 def parse_file_name(key: str) -> FileItem:
-    name = os.path.basename(key)
-
-    # extension from last dot
-    last_dot = name.rfind(".")
-    ext = name[last_dot + 1:] if last_dot > -1 else ""
-
-    # split into at most 4 segments: device, yyyymmdd, hhmmss, remainder (part+ext)
-    parts = name.split("_", 3)
-    device = parts[0] if len(parts) > 0 else ""
-    ymd = parts[1] if len(parts) > 1 else ""
-    hms = parts[2] if len(parts) > 2 else ""
-    remainder = parts[3] if len(parts) > 3 else ""
-
-    # date
-    yyyy = ymd[0:4] if len(ymd) >= 4 else ""
-    mm = ymd[4:6] if len(ymd) >= 6 else ""
-    dd = ymd[6:8] if len(ymd) >= 8 else ""
-    date = f"{yyyy}-{mm}-{dd}" if (yyyy and mm and dd) else ""
-
-    # time
-    hh = hms[0:2] if len(hms) >= 2 else ""
-    mi = hms[2:4] if len(hms) >= 4 else ""
-    ss = hms[4:6] if len(hms) >= 6 else ""
-    time = f"{hh}:{mi}:{ss}" if (hh and mi and ss) else ""
+    name = key.rpartition("/")[2]
+    m = _FILE_NAME_RE.fullmatch(name)
+
+    date = f"{m['yyyy']}-{m['mm']}-{m['dd']}" if m["yyyy"] else ""
+    time = f"{m['hh']}:{m['mi']}:{m['ss']}" if m["hh"] else ""
 
     # part = text before first dot in the remainder (if any)
-    part = None
-    if remainder:
-        dot_idx = remainder.find(".")
-        part = remainder[:dot_idx] if dot_idx > -1 else remainder or None
+    part = m["part"] if (m["part"] or m["rest"]) else None
+
+    return FileItem(name=name, device=m["device"], date=date, time=time, part=part, ext=m["ext"] or "")
+
+# YYYYMMDD_HHMMSS, matched as loosely as the old split: 8 chars before the first
+# underscore and exactly 6 after it
+_CUSTOM_TIMESTAMP_RE = re.compile(
+    r"(?P<yyyy>[^_]{4})(?P<mm>[^_]{2})(?P<dd>[^_]{2})_(?P<hh>.{2})(?P<mi>.{2})(?P<ss>.{2})",
+    re.DOTALL,
+)
 
-    return FileItem(name=name, device=device, date=date, time=time, part=part, ext=ext)
+@functools.lru_cache(maxsize=20000)
+def _parse_custom_filename(fname: str) -> Dict[str, Any]:
+    parts = fname.split("__")
+    device = parts[0] if len(parts) > 0 else "none"
+    timestamp = parts[1] if len(parts) > 1 else "none"
+    experiment_name = parts[2] if len(parts) > 2 else "none"
+    shimmer_field = parts[3] if len(parts) > 3 else "none"
+    filename = parts[5] if len(parts) > 5 else "none"
+    # Split shimmer_field into shimmer_device and shimmer_day
+    shimmer_device = shimmer_field
+    shimmer_day = "none"
+    if shimmer_field != "none" and "-" in shimmer_field:
+        shimmer_device, shimmer_day = shimmer_field.rsplit("-", 1)
+    # ext and part from filename
+    ext = ""
+    part = None
+    if filename and "." in filename:
+        # Text after the last dot / before the first dot, without building split lists
+        ext = filename.rpartition(".")[2]
+        part = filename.partition(".")[0]
+    elif filename:
+        part = filename
+    # Parse date and time from timestamp (format: YYYYMMDD_HHMMSS)
+    date = "none"
+    time = "none"
+    m = _CUSTOM_TIMESTAMP_RE.fullmatch(timestamp)
+    if m:
+        date = f"{m['yyyy']}-{m['mm']}-{m['dd']}"
+        time = f"{m['hh']}:{m['mi']}:{m['ss']}"
+    return {
+        "device": device,
+        "timestamp": timestamp,
+        "date": date,
+        "time": time,
+        "experiment_name": experiment_name,
+        "shimmer_device": shimmer_device,
+        "shimmer_day": shimmer_day,
+        "filename": filename,
+        "ext": ext,
+        "part": part
+    }
+
+def parse_custom_filename(fname: str) -> Dict[str, Any]:
+    """
+    Split a device__YYYYMMDD_HHMMSS__experiment__shimmer-day__...__file.ext name
+    into its fields ("none" where a segment is missing). Parsing is memoized per
+    name; each call returns a fresh dict the caller may modify.
+    """
+    return dict(_parse_custom_filename(fname))
+
+# Shimmer SD header fields: a little-endian run at offsets 0-17 (sample rate,
+# sensor bitmaps, config/trial bytes) and a big-endian run at 30-39 (version/firmware)
+SHIMMER_HEADER_LENGTH = 256
+SDH_MAC_ADDR_C_OFFSET = 24
+MAC_ADDRESS_LENGTH = 6
+_SDH_LE = struct.Struct("<Hx3B5xB4x2B")
+_SDH_BE = struct.Struct(">H2B2H2B")
+
+def _fetch_header(key: str) -> bytes:
+    """Ranged GET of just the Shimmer header of an S3 object."""
+    resp = s3_client.get_object(Bucket=S3_BUCKET, Key=key, Range=f"bytes=0-{SHIMMER_HEADER_LENGTH - 1}")
+    return resp["Body"].read()
+
+def decode_shimmer_header(file_bytes: bytes) -> Dict[str, Any]:
+    """Decode the fixed fields of a Shimmer file's 256-byte header ({} if too short)."""
+    if len(file_bytes) < SHIMMER_HEADER_LENGTH:
+        return {}
+    mac_address = file_bytes[SDH_MAC_ADDR_C_OFFSET:SDH_MAC_ADDR_C_OFFSET + MAC_ADDRESS_LENGTH].hex(":").upper()
+    (sample_rate_ticks, sensors0, sensors1, sensors2, configByte3,
+     trialConfig0, trialConfig1) = _SDH_LE.unpack_from(file_bytes, 0)
+    (shimmer_version, experiment_id, n_shimmer, fw_type, fw_major,
+     fw_minor, fw_internal) = _SDH_BE.unpack_from(file_bytes, 30)
+    sample_rate = 32768 / sample_rate_ticks if sample_rate_ticks else None
+    return {
+        "mac_address": mac_address,
+        "sample_rate": sample_rate,
+        "sensors0": sensors0,
+        "sensors1": sensors1,
+        "sensors2": sensors2,
+        "configByte3": configByte3,
+        "trialConfig0": trialConfig0,
+        "trialConfig1": trialConfig1,
+        "shimmer_version": shimmer_version,
+        "experiment_id": experiment_id,
+        "n_shimmer": n_shimmer,
+        "fw_type": fw_type,
+        "fw_major": fw_major,
+        "fw_minor": fw_minor,
+        "fw_internal": fw_internal
+    }
 
 @app.post("/upload/")
 async def upload_file(file: UploadFile = File(...)):
@@ -164,112 +678,18 @@ async def upload_file(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="Only .txt files are allowed.")
         # Read file bytes for decoding
         file_bytes = await file.read()
-        # Upload to S3
-        file.file.seek(0)
-        s3_client.upload_fileobj(io.BytesIO(file_bytes), S3_BUCKET, file.filename)
-
-        # Decode header (reuse decode_shimmer_header from combined-meta)
-        def decode_shimmer_header(file_bytes):
-            HEADER_LENGTH = 256
-            if len(file_bytes) < HEADER_LENGTH:
-                return {}
-            header = file_bytes[:HEADER_LENGTH]
-            def get_byte(offset):
-                return header[offset]
-            def get_bytes(offset, length):
-                return header[offset:offset+length]
-            SDH_MAC_ADDR_C_OFFSET = 24
-            MAC_ADDRESS_LENGTH = 6
-            mac_bytes = get_bytes(SDH_MAC_ADDR_C_OFFSET, MAC_ADDRESS_LENGTH)
-            mac_address = ':'.join(f'{b:02X}' for b in mac_bytes)
-            SDH_SAMPLE_RATE_0 = 0
-            sample_rate_ticks = struct.unpack('<H', get_bytes(SDH_SAMPLE_RATE_0, 2))[0]
-            sample_rate = 32768 / sample_rate_ticks if sample_rate_ticks else None
-            SDH_SENSORS0 = 3
-            SDH_SENSORS1 = 4
-            SDH_SENSORS2 = 5
-            sensors0 = get_byte(SDH_SENSORS0)
-            sensors1 = get_byte(SDH_SENSORS1)
-            sensors2 = get_byte(SDH_SENSORS2)
-            SDH_CONFIG_SETUP_BYTE3 = 11
-            configByte3 = get_byte(SDH_CONFIG_SETUP_BYTE3)
-            SDH_TRIAL_CONFIG0 = 16
-            SDH_TRIAL_CONFIG1 = 17
-            trialConfig0 = get_byte(SDH_TRIAL_CONFIG0)
-            trialConfig1 = get_byte(SDH_TRIAL_CONFIG1)
-            SDH_SHIMMERVERSION_BYTE_0 = 30
-            shimmer_version = struct.unpack('>H', get_bytes(SDH_SHIMMERVERSION_BYTE_0, 2))[0]
-            SDH_MYTRIAL_ID = 32
-            experiment_id = get_byte(SDH_MYTRIAL_ID)
-            SDH_NSHIMMER = 33
-            n_shimmer = get_byte(SDH_NSHIMMER)
-            SDH_FW_VERSION_TYPE_0 = 34
-            SDH_FW_VERSION_MAJOR_0 = 36
-            SDH_FW_VERSION_MINOR = 38
-            SDH_FW_VERSION_INTERNAL = 39
-            fw_type = struct.unpack('>H', get_bytes(SDH_FW_VERSION_TYPE_0, 2))[0]
-            fw_major = struct.unpack('>H', get_bytes(SDH_FW_VERSION_MAJOR_0, 2))[0]
-            fw_minor = get_byte(SDH_FW_VERSION_MINOR)
-            fw_internal = get_byte(SDH_FW_VERSION_INTERNAL)
-            return {
-                "mac_address": mac_address,
-                "sample_rate": sample_rate,
-                "sensors0": sensors0,
-                "sensors1": sensors1,
-                "sensors2": sensors2,
-                "configByte3": configByte3,
-                "trialConfig0": trialConfig0,
-                "trialConfig1": trialConfig1,
-                "shimmer_version": shimmer_version,
-                "experiment_id": experiment_id,
-                "n_shimmer": n_shimmer,
-                "fw_type": fw_type,
-                "fw_major": fw_major,
-                "fw_minor": fw_minor,
-                "fw_internal": fw_internal
-            }
+        # Upload to S3 (boto3 blocks, so keep it off the event loop). Small files go up
+        # in one PUT straight from the bytes already read; big ones let the transfer
+        # manager multipart-upload the spooled file without another in-memory copy
+        if len(file_bytes) <= S3_PART_SIZE:
+            await run_in_threadpool(s3_client.put_object, Bucket=S3_BUCKET, Key=file.filename, Body=file_bytes)
+        else:
+            file.file.seek(0)
+            await run_in_threadpool(s3_client.upload_fileobj, file.file, S3_BUCKET, file.filename)
+        _invalidate_listing()
 
         # Parse filename for metadata
-        def parse_custom_filename(fname):
-            parts = fname.split("__")
-            device = parts[0] if len(parts) > 0 else "none"
-            timestamp = parts[1] if len(parts) > 1 else "none"
-            experiment_name = parts[2] if len(parts) > 2 else "none"
-            shimmer_field = parts[3] if len(parts) > 3 else "none"
-            filename = parts[5] if len(parts) > 5 else "none"
-            shimmer_device = shimmer_field
-            shimmer_day = "none"
-            if shimmer_field != "none" and "-" in shimmer_field:
-                shimmer_device, shimmer_day = shimmer_field.rsplit("-", 1)
-            ext = ""
-            part = None
-            if filename and "." in filename:
-                ext = filename.split(".")[-1]
-                part = filename.split(".")[0]
-            elif filename:
-                part = filename
-            date = "none"
-            time = "none"
-            if timestamp and "_" in timestamp:
-                ymd, hms = timestamp.split("_", 1)
-                if len(ymd) == 8 and len(hms) == 6:
-                    date = f"{ymd[:4]}-{ymd[4:6]}-{ymd[6:8]}"
-                    time = f"{hms[:2]}:{hms[2:4]}:{hms[4:6]}"
-            return {
-                "full_file_name": fname,
-                "device": device,
-                "timestamp": timestamp,
-                "date": date,
-                "time": time,
-                "experiment_name": experiment_name,
-                "shimmer_device": shimmer_device,
-                "shimmer_day": shimmer_day,
-                "filename": filename,
-                "ext": ext,
-                "part": part
-            }
-
-        meta = parse_custom_filename(file.filename)
+        meta = {"full_file_name": file.filename, **parse_custom_filename(file.filename)}
         decoded = decode_shimmer_header(file_bytes)
 
         # Combine metadata and decoded info
@@ -279,9 +699,8 @@ async def upload_file(file: UploadFile = File(...)):
         file_table_name = os.getenv("DDB_FILE_TABLE")
         if not file_table_name:
             raise HTTPException(status_code=500, detail="DDB_FILE_TABLE env not set")
-        ddb = boto3.resource("dynamodb")
-        file_table = ddb.Table(file_table_name)
-        file_table.put_item(Item=item)
+        # Resolve the Table inside the worker: Table handles are per thread
+        await run_in_threadpool(lambda: _ddb_table(file_table_name).put_item(Item=item))
 
         return {"filename": file.filename, "message": "Upload and decode successful", "ddb_item": item}
     except (BotoCoreError, ClientError) as e:
@@ -290,116 +709,62 @@ async def upload_file(file: UploadFile = File(...)):
 @app.get("/files/", response_model=List[str])
 def list_files():
     try:
-        response = s3_client.list_objects_v2(Bucket=S3_BUCKET)
-        contents = response.get("Contents", [])
-        return [obj["Key"] for obj in contents]
+        keys, _ = _cached_listing()
+        # Plain strings need no validation or jsonable_encoder pass; serialize directly
+        return RawJSONResponse(content=keys)
     except (BotoCoreError, ClientError) as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-from typing import Any
 @app.get("/files/metadata/")
 def get_files_metadata() -> Dict[str, Any]:
     try:
-        response = s3_client.list_objects_v2(Bucket=S3_BUCKET)
-        contents = response.get("Contents", [])
-        keys = [obj["Key"] for obj in contents]
-
-        # Load device→patient mapping from DynamoDB
-        mapping: Dict[str, Optional[str]] = {}
-        table = _get_ddb_table()
-        scan_kwargs: Dict = {"ProjectionExpression": "device, patient"}
-        while True:
-            dresp = table.scan(**scan_kwargs)
-            for it in dresp.get("Items", []):
-                dev = it.get("device")
-                pat = it.get("patient")
-                if dev:
-                    mapping[dev] = pat if (pat is not None and pat != "") else None
-            if "LastEvaluatedKey" in dresp:
-                scan_kwargs["ExclusiveStartKey"] = dresp["LastEvaluatedKey"]
-            else:
-                break
-
         # Load recordedTimestamp from DynamoDB file table (for decoded files)
-        file_metadata: Dict[str, Dict[str, Any]] = {}
-        file_table_name = os.getenv("DDB_FILE_TABLE")
-        if file_table_name:
-            try:
-                ddb = boto3.resource("dynamodb")
-                file_table = ddb.Table(file_table_name)
-                scan_kwargs = {"ProjectionExpression": "full_file_name, recordedTimestamp"}
-                while True:
-                    fresp = file_table.scan(**scan_kwargs)
-                    for it in fresp.get("Items", []):
+        def load_file_metadata() -> Dict[str, Any]:
+            file_metadata: Dict[str, Any] = {}
+            file_table_name = os.getenv("DDB_FILE_TABLE")
+            if file_table_name:
+                try:
+                    items = _scan_all(file_table_name, ProjectionExpression="full_file_name, recordedTimestamp")
+                    for it in items:
                         fname = it.get("full_file_name")
                         recorded_ts = it.get("recordedTimestamp")
                         if fname:
-                            file_metadata[fname] = {"recordedTimestamp": recorded_ts}
-                    if "LastEvaluatedKey" in fresp:
-                        scan_kwargs["ExclusiveStartKey"] = fresp["LastEvaluatedKey"]
-                    else:
-                        break
-            except Exception as e:
-                # If file table doesn't exist or error, continue without recordedTimestamp
-                pass
-
-        from collections import defaultdict
-        # Group by (device, date)
-        def parse_custom_filename(fname):
-            parts = fname.split("__")
-            device = parts[0] if len(parts) > 0 else "none"
-            timestamp = parts[1] if len(parts) > 1 else "none"
-            experiment_name = parts[2] if len(parts) > 2 else "none"
-            shimmer_field = parts[3] if len(parts) > 3 else "none"
-            filename = parts[5] if len(parts) > 5 else "none"
-            # Split shimmer_field into shimmer_device and shimmer_day
-            shimmer_device = shimmer_field
-            shimmer_day = "none"
-            if shimmer_field != "none" and "-" in shimmer_field:
-                shimmer_device, shimmer_day = shimmer_field.rsplit("-", 1)
-            # ext and part from filename
-            ext = ""
-            part = None
-            if filename and "." in filename:
-                ext = filename.split(".")[-1]
-                part = filename.split(".")[0]
-            elif filename:
-                part = filename
-            # Parse date and time from timestamp (format: YYYYMMDD_HHMMSS)
-            date = "none"
-            time = "none"
-            if timestamp and "_" in timestamp:
-                ymd, hms = timestamp.split("_", 1)
-                if len(ymd) == 8 and len(hms) == 6:
-                    date = f"{ymd[:4]}-{ymd[4:6]}-{ymd[6:8]}"
-                    time = f"{hms[:2]}:{hms[2:4]}:{hms[4:6]}"
-            return {
-                "device": device,
-                "timestamp": timestamp,
-                "time": time,
-                "experiment_name": experiment_name,
-                "shimmer_device": shimmer_device,
-                "shimmer_day": shimmer_day,
-                "date": date,
-                "filename": filename,
-                "ext": ext,
-                "part": part
-            }
-
-        grouped = defaultdict(lambda: {"files": [], "patient": None, "shimmer_devices": set()})
+                            file_metadata[fname] = recorded_ts
+                except Exception as e:
+                    # If file table doesn't exist or error, continue without recordedTimestamp
+                    pass
+            return file_metadata
+
+        # The S3 listing and the file-table scan are independent; overlap their round trips
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            listing_f = ex.submit(_cached_listing)
+            file_metadata_f = ex.submit(load_file_metadata)
+            keys, _ = listing_f.result()
+            # Reuse the cached full mapping when warm; otherwise fetch only the
+            # devices that actually appear in the bucket
+            mapping = _peek_patient_mapping()
+            if mapping is None:
+                mapping = _batch_get_patients({
+                    os.path.basename(k).split("__", 1)[0] for k in keys if not _is_decoded_field_key(k)
+                })
+            file_metadata = file_metadata_f.result()
+
+        # Group by (device, date, patient)
+        grouped: Dict[tuple, Dict[str, Any]] = {}
         for k in keys:
-            meta = parse_custom_filename(os.path.basename(k))
+            if _is_decoded_field_key(k):
+                continue
+            # Only read below, so use the memoized dict without copying it
+            meta = _parse_custom_filename(os.path.basename(k))
             device = meta["device"]
             date = meta["date"]  # Fallback date from filename
             time = meta["time"]  # Fallback time from filename
             experiment_name = meta["experiment_name"]
             shimmer_device = meta["shimmer_device"]
-            timestamp = meta["timestamp"]
             pat = mapping.get(device)
             
             # Get recordedTimestamp from DynamoDB if available
-            file_meta = file_metadata.get(k, {})
-            recorded_ts = file_meta.get("recordedTimestamp")
+            recorded_ts = file_metadata.get(k)
             
             # Parse date and time from recordedTimestamp if available
             if recorded_ts:
@@ -414,7 +779,7 @@ def get_files_metadata() -> Dict[str, Any]:
             
             file_record = {
                 "fullname": k,
-                "timestamp": timestamp,
+                "timestamp": meta["timestamp"],
                 "time": time,  # Use time from recordedTimestamp if available
                 "filename": meta["filename"],
                 "shimmer_device": meta["shimmer_device"],
@@ -426,12 +791,15 @@ def get_files_metadata() -> Dict[str, Any]:
             if recorded_ts:
                 file_record["recordedTimestamp"] = recorded_ts
             
-            # Group by date from recordedTimestamp (if available) or filename
-            grouped[(device, date, pat)]["files"].append(file_record)
-            grouped[(device, date, pat)]["patient"] = pat if (pat is not None and pat != "") else "none"
-            grouped[(device, date, pat)]["experiment_name"] = experiment_name
+            # Group by date from recordedTimestamp (if available) or filename;
+            # look the group up once per file instead of once per field
+            group = grouped.get((device, date, pat))
+            if group is None:
+                group = grouped[(device, date, pat)] = {"files": [], "shimmer_devices": set()}
+            group["files"].append(file_record)
+            group["experiment_name"] = experiment_name
             if shimmer_device != "none":
-                grouped[(device, date, pat)]["shimmer_devices"].add(shimmer_device)
+                group["shimmer_devices"].add(shimmer_device)
         # Convert to desired output format
         result = []
         for (device, date, patient), value in grouped.items():
@@ -454,13 +822,17 @@ def get_files_metadata() -> Dict[str, Any]:
 @app.get("/download/{filename}")
 def download_file(filename: str):
     try:
-        fileobj = s3_client.get_object(Bucket=S3_BUCKET, Key=filename)["Body"]
+        resp = s3_client.get_object(Bucket=S3_BUCKET, Key=filename)
+        # Uploads are .txt; anything else (e.g. .dat recordings) is served as binary
+        media_type = "text/plain" if filename.lower().endswith(".txt") else "application/octet-stream"
         return StreamingResponse(
-            fileobj,
-            media_type="text/plain",
+            # 1 MiB chunks instead of iterating the body's small default reads
+            resp["Body"].iter_chunks(chunk_size=S3_COPY_CHUNK_SIZE),
+            media_type=media_type,
             headers={
                 "Content-Disposition": f"attachment; filename={filename}",
-                "Content-Type": "text/plain"
+                "Content-Length": str(resp["ContentLength"]),
+                "Content-Type": media_type
             }
         )
     except (BotoCoreError, ClientError) as e:
@@ -474,14 +846,7 @@ async def generate_upload_url(filename: str = Query(...), request: Request = Non
     """
     try:
         tags = request.query_params.get("tags") if request else None
-        params = {"Bucket": S3_BUCKET, "Key": filename}
-        if tags:
-            params["Tagging"] = tags
-        url = s3_client.generate_presigned_url(
-            ClientMethod="put_object",
-            Params=params,
-            ExpiresIn=3600
-        )
+        url = _presign("put_object", filename, tags)
         return {"upload_url": url}
     except (BotoCoreError, ClientError) as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -489,11 +854,7 @@ async def generate_upload_url(filename: str = Query(...), request: Request = Non
 @app.get("/generate-download-url/")
 def generate_download_url(filename: str = Query(...)):
     try:
-        url = s3_client.generate_presigned_url(
-            ClientMethod="get_object",
-            Params={"Bucket": S3_BUCKET, "Key": filename},
-            ExpiresIn=3600  # URL valid for 1 hour
-        )
+        url = _presign("get_object", filename)  # URL valid for at least 30 minutes
         return {"download_url": url}
     except (BotoCoreError, ClientError) as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -504,8 +865,22 @@ def missing_files(filenames: List[str] = Body(...)):
     Given a list of filenames, return the ones not present in S3.
     """
     try:
-        response = s3_client.list_objects_v2(Bucket=S3_BUCKET)
-        s3_files = set(obj["Key"] for obj in response.get("Contents", []))
+        s3_files = _peek_listing()
+        wanted = set(filenames)
+        if s3_files is None and len(wanted) <= S3_HEAD_PROBE_MAX:
+            # A few names: HEAD each one instead of listing the whole bucket
+            names = [f for f in wanted if f]
+            with ThreadPoolExecutor(max_workers=max(1, min(S3_HEAD_WORKERS, len(names)))) as ex:
+                s3_files = {f for f, found in zip(names, ex.map(_s3_key_exists, names)) if found}
+        elif s3_files is None:
+            # No fresh listing: walk pages only until every requested name is found
+            remaining = set(wanted)
+            # Names from one device share a prefix; only that slice of the bucket needs listing
+            for page in _iter_list_pages(os.path.commonprefix(list(wanted))):
+                remaining.difference_update(obj["Key"] for obj in page.get("Contents", ()))
+                if not remaining:
+                    break
+            s3_files = wanted - remaining
         missing = [f for f in filenames if f not in s3_files]
         return {"missing_files": missing}
     except (BotoCoreError, ClientError) as e:
@@ -517,21 +892,14 @@ def download_all_url():
     Create a ZIP of all S3 files, upload to S3, and return a presigned download URL.
     """
     try:
-        response = s3_client.list_objects_v2(Bucket=S3_BUCKET)
-        contents = response.get("Contents", [])
-        if not contents:
+        keys, _ = _cached_listing()
+        if not keys:
             raise HTTPException(status_code=404, detail="No files found in S3 bucket.")
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w") as zipf:
-            for obj in contents:
-                key = obj["Key"]
-                s3_obj = s3_client.get_object(Bucket=S3_BUCKET, Key=key)
-                file_bytes = s3_obj["Body"].read()
-                zipf.writestr(key, file_bytes)
-        zip_buffer.seek(0)
         zip_key = "all_files.zip"
-        # Upload ZIP to S3
-        s3_client.upload_fileobj(zip_buffer, S3_BUCKET, zip_key)
+        # Stream the ZIP to S3 part by part instead of buffering it in memory
+        with _S3MultipartWriter(zip_key) as out:
+            for _ in _iter_zip(out, keys):
+                pass
         # Generate presigned URL
         url = s3_client.generate_presigned_url(
             ClientMethod="get_object",
@@ -542,64 +910,246 @@ def download_all_url():
     except (BotoCoreError, ClientError) as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/download-all/")
+def download_all():
+    """
+    Stream a ZIP of all S3 files straight to the client, without storing the
+    archive in S3. Prefer /download-all-url/ behind API Gateway, which caps
+    response payload size.
+    """
+    try:
+        keys, _ = _cached_listing()
+    except (BotoCoreError, ClientError) as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not keys:
+        raise HTTPException(status_code=404, detail="No files found in S3 bucket.")
+    return StreamingResponse(
+        _stream_zip(keys),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=all_files.zip"}
+    )
+
 # ---------------------- DynamoDB helpers ----------------------
 
+# Parallel Scan segments for whole-table reads (one thread per segment)
+DDB_SCAN_SEGMENTS = 4
+# Concurrent 25-item batch writes
+DDB_WRITE_WORKERS = 8
+
+# The device→patient table only changes through this API, so reads share one scan
+# for this long; writes made here drop the cache immediately
+DDB_MAPPING_CACHE_TTL = 60.0
+_mapping_cache_lock = Lock()
+_mapping_cache: Dict[str, Any] = {"expires_at": 0.0, "records": [], "mapping": {}}
+
+def _ddb_table(table_name: str):
+    """Return this thread's cached Table handle for the given table name."""
+    tables = getattr(_ddb_local, "tables", None)
+    if tables is None:
+        tables = _ddb_local.tables = {}
+    table = tables.get(table_name)
+    if table is None:
+        table = tables[table_name] = _get_ddb_resource().Table(table_name)
+    return table
+
+_ddb_serializer = TypeSerializer()
+_ddb_deserializer = TypeDeserializer()
+
+def _ddb_serialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: _ddb_serializer.serialize(v) for k, v in item.items()}
+
+def _ddb_deserialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: _ddb_deserializer.deserialize(v) for k, v in item.items()}
+
+def _ddb_client_kwargs(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Translate resource-style request kwargs (Attr/Key condition objects, plain
+    Python values) into their low-level client form, as the resource layer would.
+    """
+    out = dict(kwargs)
+    names = dict(out.pop("ExpressionAttributeNames", None) or {})
+    values = dict(out.pop("ExpressionAttributeValues", None) or {})
+    builder = ConditionExpressionBuilder()
+    for param, is_key_condition in (("FilterExpression", False), ("KeyConditionExpression", True)):
+        condition = out.get(param)
+        if isinstance(condition, ConditionBase):
+            built = builder.build_expression(condition, is_key_condition=is_key_condition)
+            out[param] = built.condition_expression
+            names.update(built.attribute_name_placeholders)
+            values.update(built.attribute_value_placeholders)
+    if names:
+        out["ExpressionAttributeNames"] = names
+    if values:
+        out["ExpressionAttributeValues"] = _ddb_serialize_item(values)
+    if "ExclusiveStartKey" in out:
+        out["ExclusiveStartKey"] = _ddb_serialize_item(out["ExclusiveStartKey"])
+    return out
+
+def _scan_all(table_name: str, segments: int = DDB_SCAN_SEGMENTS, **scan_kwargs) -> List[Dict]:
+    """
+    Return every item of the named table. With segments > 1 the table is split into
+    Scan segments (Segment/TotalSegments) that are paginated on parallel threads.
+    Pages are read with the shared low-level client, which unlike the Table
+    resource is safe to use from the worker threads.
+    """
+    client = _get_ddb_client()
+    base_kwargs = _ddb_client_kwargs(scan_kwargs)
+    base_kwargs["TableName"] = table_name
+
+    def scan_segment(segment: int) -> List[Dict]:
+        kwargs = dict(base_kwargs)
+        if segments > 1:
+            kwargs.update(Segment=segment, TotalSegments=segments)
+        items: List[Dict] = []
+        while True:
+            resp = client.scan(**kwargs)
+            items.extend(_ddb_deserialize_item(it) for it in resp.get("Items", []))
+            if "LastEvaluatedKey" in resp:
+                # Already in wire format; pass it straight back
+                kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+            else:
+                return items
+
+    if segments <= 1:
+        return scan_segment(0)
+    with ThreadPoolExecutor(max_workers=segments) as ex:
+        return [it for seg in ex.map(scan_segment, range(segments)) for it in seg]
+
+def _query_all(table, **query_kwargs) -> List[Dict]:
+    """Return every item matching a Query, following LastEvaluatedKey."""
+    items: List[Dict] = []
+    while True:
+        resp = table.query(**query_kwargs)
+        items.extend(resp.get("Items", []))
+        if "LastEvaluatedKey" in resp:
+            query_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+        else:
+            return items
+
 def _get_ddb_table():
+    # Env check stays outside the cache so a missing variable is never memoized
     table_name = os.getenv("DDB_TABLE")
     if not table_name:
         raise HTTPException(status_code=500, detail="DDB_TABLE env not set")
-    ddb = boto3.resource("dynamodb")
-    return ddb.Table(table_name)
+    return _ddb_table(table_name)
+
+def _get_mapping_records() -> List[DevicePatientRecord]:
+    """
+    Return every mapping-table record, cached for DDB_MAPPING_CACHE_TTL seconds
+    together with the {device: patient} view derived from the same scan. The lock
+    is held while refreshing so a burst of requests triggers a single scan.
+    Callers must treat the result as read-only.
+    """
+    with _mapping_cache_lock:
+        if monotonic() < _mapping_cache["expires_at"]:
+            return _mapping_cache["records"]
+        items = _scan_all(_get_ddb_table().name, ProjectionExpression="device, patient, shimmer1, shimmer2, updatedAt")
+        records = [
+            _construct(
+                DevicePatientRecord,
+                device=it.get("device", ""),
+                patient=it.get("patient"),
+                shimmer1=it.get("shimmer1"),
+                shimmer2=it.get("shimmer2"),
+                updatedAt=it.get("updatedAt")
+            )
+            for it in items
+        ]
+        mapping: Dict[str, Optional[str]] = {}
+        for it in items:
+            dev = it.get("device")
+            pat = it.get("patient")
+            if dev:
+                mapping[dev] = pat if (pat is not None and pat != "") else None
+        _mapping_cache.update(expires_at=monotonic() + DDB_MAPPING_CACHE_TTL, records=records, mapping=mapping)
+        return records
+
+def _get_patient_mapping() -> Dict[str, Optional[str]]:
+    """Return {device: patient or None} from the cached mapping scan (read-only)."""
+    _get_mapping_records()
+    with _mapping_cache_lock:
+        return _mapping_cache["mapping"]
+
+def _peek_patient_mapping() -> Optional[Dict[str, Optional[str]]]:
+    """Return the cached mapping if it is still fresh, else None (never scans)."""
+    with _mapping_cache_lock:
+        if monotonic() < _mapping_cache["expires_at"]:
+            return _mapping_cache["mapping"]
+    return None
+
+def _batch_get_mapping_items(devices, projection: str = "device, patient") -> List[Dict]:
+    """
+    Return the mapping-table items for just the given devices using BatchGetItem
+    (100 keys per call, chunks fetched in parallel on the shared low-level client).
+    Unknown devices are omitted.
+    """
+    table = _get_ddb_table()
+    client = _get_ddb_client()
+    # Empty strings are not valid key values
+    devices = [d for d in devices if d]
+
+    def get_chunk(chunk: List[str]) -> List[Dict]:
+        request = {table.name: {"Keys": [{"device": {"S": d}} for d in chunk], "ProjectionExpression": projection}}
+        items: List[Dict] = []
+        delay = 0.05
+        while request:
+            resp = client.batch_get_item(RequestItems=request)
+            items.extend(_ddb_deserialize_item(it) for it in resp.get("Responses", {}).get(table.name, []))
+            request = resp.get("UnprocessedKeys")
+            if request:
+                # Throttled keys come back unprocessed; back off before retrying them
+                sleep(delay)
+                delay = min(delay * 2, 1.0)
+        return items
+
+    chunks = [devices[i:i+100] for i in range(0, len(devices), 100)]
+    with ThreadPoolExecutor(max_workers=DDB_WRITE_WORKERS) as ex:
+        return [it for items in ex.map(get_chunk, chunks) for it in items]
+
+def _batch_put_items(table_name: str, items: List[Dict]) -> None:
+    """
+    Put up to 25 items with one BatchWriteItem on the shared client (safe from
+    worker threads), retrying throttled UnprocessedItems with backoff.
+    """
+    client = _get_ddb_client()
+    request = {table_name: [{"PutRequest": {"Item": _ddb_serialize_item(it)}} for it in items]}
+    delay = 0.05
+    while request:
+        resp = client.batch_write_item(RequestItems=request)
+        request = resp.get("UnprocessedItems")
+        if request:
+            # Throttled writes come back unprocessed; back off before retrying them
+            sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+def _batch_get_patients(devices) -> Dict[str, Optional[str]]:
+    """Return {device: patient or None} for just the given devices (see _batch_get_mapping_items)."""
+    mapping: Dict[str, Optional[str]] = {}
+    for it in _batch_get_mapping_items(devices):
+        pat = it.get("patient")
+        mapping[it["device"]] = pat if (pat is not None and pat != "") else None
+    return mapping
+
+def _invalidate_patient_mapping():
+    """Drop the cached mapping after this process writes to the mapping table."""
+    with _mapping_cache_lock:
+        _mapping_cache["expires_at"] = 0.0
 
 # ---------------------- DynamoDB mapping endpoints ----------------------
 @app.get("/ddb/device-patient-map", response_model=List[DevicePatientRecord])
 def ddb_get_device_patient_map():
     """Return full list of records with device, patient, updatedAt from DynamoDB."""
     try:
-        table = _get_ddb_table()
-        records: List[DevicePatientRecord] = []
-        scan_kwargs: Dict = {"ProjectionExpression": "device, patient, shimmer1, shimmer2, updatedAt"}
-        while True:
-            resp = table.scan(**scan_kwargs)
-            for it in resp.get("Items", []):
-                records.append(DevicePatientRecord(
-                    device=it.get("device", ""),
-                    patient=it.get("patient"),
-                    shimmer1=it.get("shimmer1"),
-                    shimmer2=it.get("shimmer2"),
-                    updatedAt=it.get("updatedAt")
-                ))
-            if "LastEvaluatedKey" in resp:
-                scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
-            else:
-                break
-        return records
+        return _get_mapping_records()
     except (BotoCoreError, ClientError) as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/ddb/device-patient-map/details", response_model=List[DevicePatientRecord])
 def ddb_get_device_patient_map_details():
-    """Return full records with device, patient, updatedAt from DynamoDB."""
+    """Same records as /ddb/device-patient-map; kept for existing clients."""
     try:
-        table = _get_ddb_table()
-        records: List[DevicePatientRecord] = []
-        scan_kwargs: Dict = {"ProjectionExpression": "device, patient, shimmer1, shimmer2, updatedAt"}
-        while True:
-            resp = table.scan(**scan_kwargs)
-            for it in resp.get("Items", []):
-                records.append(DevicePatientRecord(
-                    device=it.get("device", ""),
-                    patient=it.get("patient"),
-                    shimmer1=it.get("shimmer1"),
-                    shimmer2=it.get("shimmer2"),
-                    updatedAt=it.get("updatedAt")
-                ))
-            if "LastEvaluatedKey" in resp:
-                scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
-            else:
-                break
-        return records
+        return _get_mapping_records()
     except (BotoCoreError, ClientError) as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -627,25 +1177,38 @@ def ddb_get_device_mapping(device: str):
 def ddb_put_device_patient_map(mapping: Dict[str, str] = Body(...)):
     """Replace the map by writing items and return full records (device, patient, updatedAt)."""
     try:
-        table = _get_ddb_table()
+        table_name = _get_ddb_table().name
+        devices = list(mapping)
+
+        def put_chunk(chunk: List[str]) -> List[DevicePatientRecord]:
+            records: List[DevicePatientRecord] = []
+            items: List[Dict] = []
+            # One timestamp per 25-item batch is precise enough for the audit field
+            ts = datetime.now(timezone.utc).isoformat()
+            for d in chunk:
+                patient = mapping[d].get("patient") if isinstance(mapping[d], dict) else mapping[d]
+                shimmer1 = mapping[d].get("shimmer1") if isinstance(mapping[d], dict) else None
+                shimmer2 = mapping[d].get("shimmer2") if isinstance(mapping[d], dict) else None
+                items.append({
+                    "device": d,
+                    "patient": patient,
+                    "shimmer1": shimmer1,
+                    "shimmer2": shimmer2,
+                    "updatedAt": ts,
+                })
+                records.append(_construct(DevicePatientRecord, device=d, patient=patient, shimmer1=shimmer1, shimmer2=shimmer2, updatedAt=ts))
+            _batch_put_items(table_name, items)
+            return records
+
+        # Chunks are independent, so send them concurrently instead of one RTT after another
+        chunks = [devices[i:i+25] for i in range(0, len(devices), 25)]
         written: List[DevicePatientRecord] = []
-        devices = list(mapping.keys())
-        for i in range(0, len(devices), 25):
-            chunk = devices[i:i+25]
-            with table.batch_writer() as batch:
-                for d in chunk:
-                    ts = datetime.now(timezone.utc).isoformat()
-                    patient = mapping[d].get("patient") if isinstance(mapping[d], dict) else mapping[d]
-                    shimmer1 = mapping[d].get("shimmer1") if isinstance(mapping[d], dict) else None
-                    shimmer2 = mapping[d].get("shimmer2") if isinstance(mapping[d], dict) else None
-                    batch.put_item(Item={
-                        "device": d,
-                        "patient": patient,
-                        "shimmer1": shimmer1,
-                        "shimmer2": shimmer2,
-                        "updatedAt": ts,
-                    })
-                    written.append(DevicePatientRecord(device=d, patient=patient, shimmer1=shimmer1, shimmer2=shimmer2, updatedAt=ts))
+        with ThreadPoolExecutor(max_workers=DDB_WRITE_WORKERS) as ex:
+            try:
+                for records in ex.map(put_chunk, chunks):
+                    written.extend(records)
+            finally:
+                _invalidate_patient_mapping()
         return written
     except (BotoCoreError, ClientError) as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -668,6 +1231,7 @@ def ddb_put_device_mapping(device: str, payload: Dict[str, str] = Body(...)):
             "shimmer2": shimmer2,
             "updatedAt": ts,
         })
+        _invalidate_patient_mapping()
         return {
             "device": device,
             "patient": patient,
@@ -687,6 +1251,7 @@ def ddb_delete_device_mapping(device: str):
             ConditionExpression="attribute_exists(device)",
             ReturnValues="ALL_OLD",
         )
+        _invalidate_patient_mapping()
         attrs = resp.get("Attributes", {}) or {}
         return {
             "device": attrs.get("device", device),
@@ -705,47 +1270,23 @@ def ddb_delete_device_mapping(device: str):
 def get_unregistered_devices():
     """Return devices present in S3 filenames but missing in DynamoDB mapping."""
     try:
-        # Collect unique devices from S3 object keys
-        devices_in_s3 = set()
-        resp = s3_client.list_objects_v2(Bucket=S3_BUCKET)
-        contents = resp.get("Contents", [])
-        for obj in contents:
-            key = obj.get("Key")
-            if not key:
-                continue
-            dev = parse_file_name(key).device
-            if dev:
-                devices_in_s3.add(dev)
-        while resp.get("IsTruncated"):
-            resp = s3_client.list_objects_v2(
-                Bucket=S3_BUCKET,
-                ContinuationToken=resp.get("NextContinuationToken")
-            )
-            for obj in resp.get("Contents", []):
-                key = obj.get("Key")
-                if not key:
-                    continue
-                dev = parse_file_name(key).device
-                if dev:
-                    devices_in_s3.add(dev)
+        with ThreadPoolExecutor(max_workers=1) as ex:
+            # List S3 in the background while DynamoDB is scanned
+            listing_f = ex.submit(_cached_listing)
 
-        # Collect registered devices from DynamoDB
-        table = _get_ddb_table()
-        registered = set()
-        scan_kwargs: Dict = {"ProjectionExpression": "device"}
-        while True:
-            dresp = table.scan(**scan_kwargs)
-            for it in dresp.get("Items", []):
-                dev = it.get("device")
-                if dev:
-                    registered.add(dev)
-            if "LastEvaluatedKey" in dresp:
-                scan_kwargs["ExclusiveStartKey"] = dresp["LastEvaluatedKey"]
-            else:
-                break
+            # Registered devices come from the shared, TTL-cached mapping scan
+            registered = _get_patient_mapping().keys()
+
+            keys, _ = listing_f.result()
+
+        # Collect unique devices from S3 object keys
+        # Only the device prefix is needed; same result as parse_file_name(key).device
+        devices_in_s3 = {
+            key.rpartition("/")[2].partition("_")[0] for key in keys if not _is_decoded_field_key(key)
+        }
+        devices_in_s3.discard("")
 
-        missing = sorted(list(devices_in_s3 - registered))
-        return missing
+        return RawJSONResponse(content=sorted(devices_in_s3 - registered))
     except (BotoCoreError, ClientError) as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -753,23 +1294,23 @@ def get_unregistered_devices():
 def list_unique_patients():
     """Return a sorted unique list of patient names from DynamoDB (exclude empty/null)."""
     try:
-        table = _get_ddb_table()
-        patients = set()
-        scan_kwargs: Dict = {"ProjectionExpression": "patient"}
-        while True:
-            resp = table.scan(**scan_kwargs)
-            for it in resp.get("Items", []):
-                p = it.get("patient")
-                if p is not None and str(p).strip() != "":
-                    patients.add(str(p))
-            if "LastEvaluatedKey" in resp:
-                scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
-            else:
-                break
-        return sorted(patients)
+        # Distinct patients come from the shared, TTL-cached mapping scan
+        patients = {
+            str(p)
+            for p in _get_patient_mapping().values()
+            if p is not None and str(p).strip() != ""
+        }
+        return RawJSONResponse(content=sorted(patients))
     except (BotoCoreError, ClientError) as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/warmup/")
+def warmup():
+    """Cheap keep-warm target: builds the shared AWS clients without calling AWS."""
+    _get_ddb_client()
+    _get_ddb_resource()
+    return {"status": "ok"}
+
 handler = Mangum(app)
 
 # Endpoint: download ZIP of files for a user and date (accepts metadata file list)
@@ -785,26 +1326,25 @@ def download_zip_by_user_date(files: List[Dict] = Body(...)):
         filenames = [f.get("fullname") for f in files if f.get("fullname")]
         if not filenames:
             raise HTTPException(status_code=400, detail="No valid 'fullname' fields found.")
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w") as zipf:
-            for key in filenames:
-                try:
-                    s3_obj = s3_client.get_object(Bucket=S3_BUCKET, Key=key)
-                    file_bytes = s3_obj["Body"].read()
-                    zipf.writestr(key, file_bytes)
-                except (BotoCoreError, ClientError) as e:
-                    raise HTTPException(status_code=404, detail=f"File not found: {key}")
-        zip_buffer.seek(0)
         # Use first file's device and date for ZIP name if available
         zip_key = "user_date_files.zip"
         if files and files[0].get("fullname"):
             first = files[0]["fullname"]
-            parts = first.split("_")
-            if len(parts) >= 3:
-                device = parts[0]
-                ymd = parts[1]
+            # Only the first two "_" fields are needed; don't split the whole name
+            parts = first.split("_", 2)
+            if len(parts) == 3:
+                device, ymd, _ = parts
                 zip_key = f"{device}_{ymd}_files.zip"
-        s3_client.upload_fileobj(zip_buffer, S3_BUCKET, zip_key)
+        try:
+            # Stream the ZIP to S3 part by part instead of buffering it in memory;
+            # a failed member aborts the multipart upload
+            with _S3MultipartWriter(zip_key) as out:
+                for _ in _iter_zip(out, filenames):
+                    pass
+        except ClientError as e:
+            if e.operation_name != "GetObject":
+                raise
+            raise HTTPException(status_code=404, detail=f"File not found: {e.response['Error'].get('Key')}")
         url = s3_client.generate_presigned_url(
             ClientMethod="get_object",
             Params={"Bucket": S3_BUCKET, "Key": zip_key},
@@ -823,122 +1363,44 @@ def parse_filename(filename: str = Query(...)):
     Handles the custom format: device__timestamp__experiment__shimmer_field__filename
     """
     try:
-        def parse_custom_filename(fname):
-            parts = fname.split("__")
-            device = parts[0] if len(parts) > 0 else "none"
-            timestamp = parts[1] if len(parts) > 1 else "none"
-            experiment_name = parts[2] if len(parts) > 2 else "none"
-            shimmer_field = parts[3] if len(parts) > 3 else "none"
-            filename = parts[5] if len(parts) > 5 else "none"
-            
-            # Split shimmer_field into shimmer_device and shimmer_day
-            shimmer_device = shimmer_field
-            shimmer_day = "none"
-            if shimmer_field != "none" and "-" in shimmer_field:
-                shimmer_device, shimmer_day = shimmer_field.rsplit("-", 1)
-            
-            # ext and part from filename
-            ext = ""
-            part = None
-            if filename and "." in filename:
-                ext = filename.split(".")[-1]
-                part = filename.split(".")[0]
-            elif filename:
-                part = filename
-            
-            # Parse date and time from timestamp (format: YYYYMMDD_HHMMSS)
-            date = "none"
-            time = "none"
-            if timestamp and "_" in timestamp:
-                ymd, hms = timestamp.split("_", 1)
-                if len(ymd) == 8 and len(hms) == 6:
-                    date = f"{ymd[:4]}-{ymd[4:6]}-{ymd[6:8]}"
-                    time = f"{hms[:2]}:{hms[2:4]}:{hms[4:6]}"
-            
-            return {
-                "original_filename": fname,
-                "device": device,
-                "timestamp": timestamp,
-                "date": date,
-                "time": time,
-                "experiment_name": experiment_name,
-                "shimmer_device": shimmer_device,
-                "shimmer_day": shimmer_day,
-                "filename": filename,
-                "ext": ext,
-                "part": part
-            }
-        
-        parsed = parse_custom_filename(filename)
+        parsed = {"original_filename": filename, **parse_custom_filename(filename)}
         return parsed
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/file/header/")
+def get_file_header(filename: str = Query(...)):
+    """
+    Decodes the 256-byte Shimmer header of a file already in S3, fetching only
+    the header bytes rather than the whole recording.
+    """
+    try:
+        return {"filename": filename, **decode_shimmer_header(_fetch_header(filename))}
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+            raise HTTPException(status_code=404, detail=f"File not found: {filename}")
+        raise HTTPException(status_code=500, detail=str(e))
+    except BotoCoreError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/files/deconstructed/")
-def get_deconstructed_files():
+def get_deconstructed_files(prefix: Optional[str] = Query(None)):
     """
     Returns a list of all files in S3 with their parsed components as individual JSON records.
     Each file is returned as a separate record with all its parsed fields.
     Skips .zip files and files in the decode folder.
+    Optional 'prefix' (e.g. a device ID) limits the listing to matching keys.
     """
     try:
-        response = s3_client.list_objects_v2(Bucket=S3_BUCKET)
-        contents = response.get("Contents", [])
-        
-        def parse_custom_filename(fname):
-            parts = fname.split("__")
-            device = parts[0] if len(parts) > 0 else "none"
-            timestamp = parts[1] if len(parts) > 1 else "none"
-            experiment_name = parts[2] if len(parts) > 2 else "none"
-            shimmer_field = parts[3] if len(parts) > 3 else "none"
-            filename = parts[5] if len(parts) > 5 else "none"
-            
-            # Split shimmer_field into shimmer_device and shimmer_day
-            shimmer_device = shimmer_field
-            shimmer_day = "none"
-            if shimmer_field != "none" and "-" in shimmer_field:
-                shimmer_device, shimmer_day = shimmer_field.rsplit("-", 1)
-            
-            # ext and part from filename
-            ext = ""
-            part = None
-            if filename and "." in filename:
-                ext = filename.split(".")[-1]
-                part = filename.split(".")[0]
-            elif filename:
-                part = filename
-            
-            # Parse date and time from timestamp (format: YYYYMMDD_HHMMSS)
-            date = "none"
-            time = "none"
-            if timestamp and "_" in timestamp:
-                ymd, hms = timestamp.split("_", 1)
-                if len(ymd) == 8 and len(hms) == 6:
-                    date = f"{ymd[:4]}-{ymd[4:6]}-{ymd[6:8]}"
-                    time = f"{hms[:2]}:{hms[2:4]}:{hms[4:6]}"
-            
-            return {
-                "fullname": fname,
-                "device": device,
-                "timestamp": timestamp,
-                "date": date,
-                "time": time,
-                "experiment_name": experiment_name,
-                "shimmer_device": shimmer_device,
-                "shimmer_day": shimmer_day,
-                "filename": filename,
-                "ext": ext,
-                "part": part
-            }
+        keys = _list_prefix(prefix) if prefix else _cached_listing()[0]
         
         result = []
-        for obj in contents:
-            key = obj["Key"]
+        for key in keys:
             # Skip .zip files and files in the decode folder
             if key.lower().endswith('.zip') or key.startswith("decode/"):
                 continue
-            parsed = parse_custom_filename(key)
+            parsed = {"fullname": key, **parse_custom_filename(key)}
             result.append(parsed)
         
         return {"data": result, "error": None}
@@ -1090,10 +1552,27 @@ def get_deconstructed_files():
 #     except Exception as e:
 #         return {"data": [], "error": str(e)}
 
+# YYYYMMDD from the second "__" field of device__YYYYMMDD_HHMMSS__..., as loosely
+# as split("__") then split("_", 1): the field must contain "_" and the text
+# before it must be exactly 8 characters
+_NAME_DATE_RE = re.compile(
+    r"(?:(?!__).)*__(?P<yyyy>[^_]{4})(?P<mm>[^_]{2})(?P<dd>[^_]{2})_(?!_)",
+    re.DOTALL,
+)
+
+# Heavy per-sample fields never returned by /files/combined-meta/
+COMBINED_META_EXCLUDE_KEYS = frozenset({
+    "headerBytes", "Accel_LN_X", "Accel_LN_Y", "Accel_LN_Z",
+    "Gyro_X", "Gyro_Y", "Gyro_Z", "Mag_X", "Mag_Y", "Mag_Z"
+})
+
 @app.get("/files/combined-meta/")
-def get_combined_meta():
+def get_combined_meta(device: Optional[str] = Query(None)):
     """
     Combines decoded file metadata from DynamoDB with patient mapping.
+    Optional 'device' limits the result to that device's groups; with
+    DDB_FILE_DEVICE_INDEX set (a GSI partitioned on device) it is a Query
+    instead of a full-table Scan.
     Each record includes S3 pointer ('decode_s3_key') to full decoded arrays.
     STRICTLY enforces one record per shimmer per group (max 2 records per group).
     Uses recordedTimestamp for grouping (NOT filename date).  # modified
@@ -1105,22 +1584,31 @@ def get_combined_meta():
         if not file_table_name:
             return {"data": [], "error": "DDB_FILE_TABLE env not set"}
 
-        ddb = boto3.resource("dynamodb")
-        file_table = ddb.Table(file_table_name)
+        file_table = _ddb_table(file_table_name)
 
-        items = []
         scan_kwargs = {}
-        while True:
-            resp = file_table.scan(**scan_kwargs)
-            items.extend(resp.get("Items", []))
-            if "LastEvaluatedKey" in resp:
-                scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
-            else:
-                break
+        device_index = os.getenv("DDB_FILE_DEVICE_INDEX")
+        if device and device_index:
+            # Groups are per (patient, device), so one device's items are enough
+            items = _query_all(file_table, IndexName=device_index, KeyConditionExpression=Key("device").eq(device))
+        else:
+            if device:
+                scan_kwargs["FilterExpression"] = Attr("device").eq(device)
+            # Segmented parallel scan instead of one page round trip after another
+            items = _scan_all(file_table_name, **scan_kwargs)
 
         # ----------- Load patient mapping -----------
+        # One BatchGetItem pass for the distinct devices in the file table, instead
+        # of a GetItem per record plus a scan of the whole mapping table
         mapping_table_name = os.getenv("DDB_TABLE")
-        mapping_table = ddb.Table(mapping_table_name) if mapping_table_name else None
+        mapping_items: Dict[str, Dict] = {}
+        if mapping_table_name:
+            devices = {item.get("device", "none") for item in items} - {"none"}
+            try:
+                for it in _batch_get_mapping_items(devices, "device, patient, shimmer1, shimmer2"):
+                    mapping_items[it["device"]] = it
+            except Exception:
+                pass
 
         from collections import defaultdict
 
@@ -1130,6 +1618,20 @@ def get_combined_meta():
         records_by_key = defaultdict(list)
 
         for item in items:
+            # Parse timestamp as UNIX; records without one are never grouped,
+            # so skip them before building their record
+            recorded_ts = item.get("recordedTimestamp")
+            try:
+                ts_unix = None
+                if recorded_ts and isinstance(recorded_ts, str):
+                    ts_unix = datetime.fromisoformat(
+                        recorded_ts.replace("Z", "+00:00")
+                    ).timestamp()
+            except Exception:
+                ts_unix = None
+            if ts_unix is None:
+                continue
+
             device = item.get("device", "none")
             shimmer_name = item.get("shimmer_device", "none")
             decode_s3_key = item.get("decode_s3_key", None)
@@ -1137,73 +1639,37 @@ def get_combined_meta():
             
             # Parse date from filename if date is missing or invalid
             full_file_name = item.get("full_file_name", "")
-            if (date == "none" or not date or date == "28-10" or len(date) < 10) and full_file_name:
+            if (date == "none" or not date or date == "28-10" or len(date) < 10) and isinstance(full_file_name, str):
                 # Parse date from filename: device__YYYYMMDD_HHMMSS__...
-                try:
-                    parts = full_file_name.split("__")
-                    if len(parts) > 1:
-                        timestamp = parts[1]
-                        if "_" in timestamp:
-                            ymd, hms = timestamp.split("_", 1)
-                            if len(ymd) == 8:
-                                date = f"{ymd[:4]}-{ymd[4:6]}-{ymd[6:8]}"
-                except Exception:
-                    pass
+                m = _NAME_DATE_RE.match(full_file_name)
+                if m:
+                    date = f"{m['yyyy']}-{m['mm']}-{m['dd']}"
 
             # Get patient
             patient = "none"
-            if mapping_table and device != "none":
-                try:
-                    resp = mapping_table.get_item(Key={"device": device})
-                    patient = resp.get("Item", {}).get("patient", "none")
-                except Exception:
-                    pass
+            if device != "none" and device in mapping_items:
+                patient = mapping_items[device].get("patient", "none")
 
-            # Remove heavy fields
-            EXCLUDE_KEYS = {
-                "headerBytes", "Accel_LN_X", "Accel_LN_Y", "Accel_LN_Z",
-                "Gyro_X", "Gyro_Y", "Gyro_Z", "Mag_X", "Mag_Y", "Mag_Z"
-            }
-            record = {k: v for k, v in item.items() if k not in EXCLUDE_KEYS}
+            # Remove heavy fields; the scanned item is ours, so strip it in place
+            # (a pop per excluded key rather than a copy of every attribute)
+            record = item
+            for k in COMBINED_META_EXCLUDE_KEYS:
+                record.pop(k, None)
 
             record["decode_s3_key"] = decode_s3_key
             record["shimmer_name"] = shimmer_name
             record["patient"] = patient
             record["date"] = date
-
-            # Parse timestamp as UNIX
-            recorded_ts = item.get("recordedTimestamp")
-            try:
-                ts_unix = None
-                if recorded_ts and isinstance(recorded_ts, str):
-                    ts_unix = datetime.fromisoformat(
-                        recorded_ts.replace("Z", "+00:00")
-                    ).timestamp()
-            except Exception:
-                ts_unix = None
-
             record["_ts_unix"] = ts_unix
 
             # ====== CHANGED: group ONLY by (patient, device) ====== # modified
             records_by_key[(patient, device)].append(record)
 
         # ----------- Build shimmer assignment map -----------
-        shimmer_map = {}
-        if mapping_table_name:
-            scan_kwargs = {"ProjectionExpression": "device, shimmer1, shimmer2"}
-            while True:
-                mresp = mapping_table.scan(**scan_kwargs)
-                for it in mresp.get("Items", []):
-                    dev = it.get("device")
-                    if dev:
-                        shimmer_map[dev] = {
-                            "shimmer1": it.get("shimmer1"),
-                            "shimmer2": it.get("shimmer2"),
-                        }
-                if "LastEvaluatedKey" in mresp:
-                    scan_kwargs["ExclusiveStartKey"] = mresp["LastEvaluatedKey"]
-                else:
-                    break
+        shimmer_map = {
+            dev: {"shimmer1": it.get("shimmer1"), "shimmer2": it.get("shimmer2")}
+            for dev, it in mapping_items.items()
+        }
 
         # ----------- Final grouping -----------
 
@@ -1211,30 +1677,29 @@ def get_combined_meta():
 
         for (patient, device), recs in records_by_key.items():
 
-            # Sort by timestamp
-            recs = sorted(
-                [r for r in recs if r["_ts_unix"] is not None],
-                key=lambda r: r["_ts_unix"]
-            )
+            # Sort by timestamp (in place; every record here has one)
+            recs.sort(key=itemgetter("_ts_unix"))
 
             mapping = shimmer_map.get(device, {})
             s1 = mapping.get("shimmer1")
             s2 = mapping.get("shimmer2")
+            # shimmer name -> (slot, decoded list key); s1 is inserted last so it
+            # wins if both are the same. Unmapped shimmers fall back to shimmer1
+            slot_of = {
+                s2: ("shimmer2", "shimmer2_decoded"),
+                s1: ("shimmer1", "shimmer1_decoded"),
+            }
+            fallback_slot = ("shimmer1", "shimmer1_decoded")
 
             curr_group = None
             group_id = 0
+            last_ts = None
 
             for rec in recs:
                 shimmer_name = rec["shimmer_name"]
 
                 # Identify shimmer type
-                if shimmer_name == s1:
-                    shimmer_type = "shimmer1"
-                elif shimmer_name == s2:
-                    shimmer_type = "shimmer2"
-                else:
-                    # fallback
-                    shimmer_type = "shimmer1"
+                shimmer_type, decoded_key = slot_of.get(shimmer_name, fallback_slot)
 
                 # Decide new group or same group
                 # Use date from current record, not outer scope variable
@@ -1252,18 +1717,13 @@ def get_combined_meta():
                         "shimmer1_decoded": [],
                         "shimmer2_decoded": [],
                     }
-                    curr_group["_last_ts"] = rec["_ts_unix"]  # modified
 
                 else:
                     # Time difference check (supports cross-day) # modified
-                    time_ok = abs(rec["_ts_unix"] - curr_group["_last_ts"]) <= GROUP_WINDOW_SECONDS
+                    time_ok = abs(rec["_ts_unix"] - last_ts) <= GROUP_WINDOW_SECONDS
 
                     # Check if shimmer slot already taken
-                    shimmer_slot_free = (
-                        shimmer_type == "shimmer1" and not curr_group["shimmer1"]
-                    ) or (
-                        shimmer_type == "shimmer2" and not curr_group["shimmer2"]
-                    )
+                    shimmer_slot_free = not curr_group[shimmer_type]
 
                     # Conditions requiring a new group
                     if not time_ok or not shimmer_slot_free:
@@ -1281,23 +1741,18 @@ def get_combined_meta():
                         }
 
                 # Add to group
-                if shimmer_type == "shimmer1":
-                    curr_group["shimmer1"] = shimmer_name
-                    curr_group["shimmer1_decoded"].append(rec)
-                else:
-                    curr_group["shimmer2"] = shimmer_name
-                    curr_group["shimmer2_decoded"].append(rec)
+                curr_group[shimmer_type] = shimmer_name
+                curr_group[decoded_key].append(rec)
 
-                curr_group["_last_ts"] = rec["_ts_unix"]
+                # Groups are emitted in order as the sweep closes them, so the
+                # running timestamp lives in a local instead of a helper key
+                # that had to be stripped from every group afterwards
+                last_ts = rec["_ts_unix"]
 
             # Append last group
             if curr_group:
                 grouped.append(curr_group)
 
-        # Remove helper keys
-        for g in grouped:
-            g.pop("_last_ts", None)
-
         return {"data": grouped, "error": None}
 
     except Exception as e:
@@ -1306,6 +1761,189 @@ def get_combined_meta():
 
 # Place this endpoint after app = FastAPI() initialization
 
+# Decoded lists/dicts whose str() is longer than this go to S3 instead of DynamoDB
+DECODE_INLINE_MAX_CHARS = 2000
+
+def _repr_longer_than(v, limit: int) -> bool:
+    """
+    Same answer as len(str(v)) > limit for a list or dict, but sums the element
+    reprs and stops as soon as the limit is passed instead of rendering the
+    whole container (sensor arrays run to tens of thousands of floats).
+    """
+    if isinstance(v, dict):
+        # "{k!r}: {v!r}" per entry
+        parts = (len(repr(k)) + 2 + len(repr(x)) for k, x in v.items())
+    else:
+        parts = (len(repr(x)) for x in v)
+    total = 2  # brackets
+    for i, n in enumerate(parts):
+        total += n + (2 if i else 0)  # ", " separators
+        if total > limit:
+            return True
+    return False
+
+def _decoded_field_key(full_file_name: str, field_name: str) -> str:
+    """S3 key holding a single decoded field of full_file_name."""
+    return f"decode/{os.path.splitext(full_file_name)[0]}_fields/{field_name}"
+
+def _is_decoded_field_key(key: str) -> bool:
+    """True for per-field decode objects, whose basename is a field name, not a device."""
+    return key.startswith("decode/") and "_fields/" in key
+
+# Homogeneous numeric arrays are stored as raw little-endian array() bytes
+# (float64 keeps unix timestamps exact); anything else stays JSON
+_FIELD_ARRAY_TYPECODES = ((float, "d"), (int, "q"))
+
+def _encode_decoded_field(value):
+    """Return (body, content_type, metadata) for one decoded field object."""
+    if isinstance(value, list) and value:
+        for py_type, typecode in _FIELD_ARRAY_TYPECODES:
+            if all(type(x) is py_type for x in value):
+                try:
+                    arr = array(typecode, value)
+                except OverflowError:
+                    break
+                if sys.byteorder != "little":
+                    arr.byteswap()
+                return arr.tobytes(), "application/octet-stream", {"typecode": typecode}
+    return _json_dumps(value), "application/json", {}
+
+def _decode_decoded_field(body: bytes, typecode: Optional[str]):
+    """Inverse of _encode_decoded_field."""
+    if not typecode:
+        return _json_loads(body)
+    arr = array(typecode)
+    arr.frombytes(body)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr.tolist()
+
+def _decode_file_item(full_file_name: str) -> Dict[str, Any]:
+    """
+    Download and decode one S3 file, upload its large decoded arrays under 'decode/',
+    and return the lightweight DynamoDB item (with its decode_s3_key) ready to put.
+    Raises on failure.
+    """
+    # ----------- Download file from S3 -----------
+    print(f"[decode-and-store] Downloading file from S3: {full_file_name}")
+    s3_obj = s3_client.get_object(Bucket=S3_BUCKET, Key=full_file_name)
+    file_bytes = s3_obj["Body"].read()
+    print(f"[decode-and-store] Downloaded {len(file_bytes)} bytes from S3.")
+
+    # ----------- Parse filename -----------
+    meta = {"full_file_name": full_file_name, **parse_custom_filename(full_file_name)}
+    print(f"[decode-and-store] Parsed filename meta: {meta}")
+
+    # ----------- Patient mapping -----------
+    patient = None
+    try:
+        mapping_table_name = os.getenv("DDB_TABLE")
+        if mapping_table_name and meta.get("device"):
+            mapping_table = _ddb_table(mapping_table_name)
+            resp = mapping_table.get_item(Key={"device": meta["device"]})
+            patient = resp.get("Item", {}).get("patient")
+            print(f"[decode-and-store] Patient mapping found: {patient}")
+    except Exception as e:
+        print(f"[decode-and-store] Error in patient mapping: {e}")
+        patient = None
+    if patient:
+        meta["patient"] = patient
+
+    # ----------- Decode shimmer data -----------
+    print(f"[decode-and-store] Decoding shimmer data...")
+    decoded = read_shimmer_dat(file_bytes)
+    print(f"[decode-and-store] Decoded keys: {list(decoded.keys())}")
+
+    # ----------- Remove unneeded heavy keys (just in case)
+    EXCLUDE_KEYS = {
+        "timestamp", "headerInfo", "headerBytes", "channelNames", "packetLengthBytes",
+        "Accel_LN_X", "Accel_LN_Y", "Accel_LN_Z", "VSenseBatt", 
+        "Gyro_X", "Gyro_Y", "Gyro_Z",
+        "Accel_WR_X", "Accel_WR_Y", "Accel_WR_Z",
+        "Mag_X", "Mag_Y", "Mag_Z",
+        "Accel_WR_y"  # in case of typo variant
+    }
+
+    # ----------- Separate large vs small data -----------
+    large_data, small_data = {}, {}
+    for k, v in decoded.items():
+        if k in EXCLUDE_KEYS:
+            continue
+        if isinstance(v, (list, dict)) and _repr_longer_than(v, DECODE_INLINE_MAX_CHARS):
+            large_data[k] = v
+        else:
+            small_data[k] = v
+
+    # Always include sampleRate in both small_data and large_data
+    if "sampleRate" in decoded:
+        try:
+            sr = round(float(decoded["sampleRate"]), 2)
+            small_data["sampleRate"] = sr
+            large_data["sampleRate"] = sr
+        except Exception:
+            pass
+
+    print(f"[decode-and-store] Large data keys: {list(large_data.keys())}")
+    print(f"[decode-and-store] Small data keys: {list(small_data.keys())}")
+
+    # ----------- Store large data to S3 -----------
+    # Upload with the client directly (pooled connection, botocore retries);
+    # errors raise ClientError
+    decode_key = f"decode/{os.path.splitext(full_file_name)[0]}_decoded.json"
+    s3_client.put_object(
+        Bucket=S3_BUCKET,
+        Key=decode_key,
+        Body=_json_dumps(large_data),
+        ContentType="application/json",
+    )
+    print(f"[decode-and-store] Uploaded decoded data to S3: {decode_key}")
+
+    # Each field also goes up on its own so /get-decoded-field-direct/ can fetch
+    # one array instead of downloading and parsing the whole document
+    def put_field(field):
+        body, content_type, metadata = _encode_decoded_field(large_data[field])
+        s3_client.put_object(
+            Bucket=S3_BUCKET,
+            Key=_decoded_field_key(full_file_name, field),
+            Body=body,
+            ContentType=content_type,
+            Metadata=metadata,
+        )
+    if large_data:
+        with ThreadPoolExecutor(max_workers=min(S3_GET_WORKERS, len(large_data))) as ex:
+            list(ex.map(put_field, large_data))
+    _invalidate_listing()
+
+    # ----------- Prepare DynamoDB record -----------
+    def convert_floats(obj):
+        from decimal import Decimal
+        if isinstance(obj, float):
+            return Decimal(str(obj))
+        if isinstance(obj, dict):
+            return {k: convert_floats(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [convert_floats(v) for v in obj]
+        return obj
+
+    # Extract recordedTimestamp from first timestampCal value
+    recorded_timestamp = None
+    if "timestampCal" in decoded and isinstance(decoded["timestampCal"], list) and len(decoded["timestampCal"]) > 0:
+        try:
+            unix_timestamp = float(decoded["timestampCal"][0])
+            dt = datetime.fromtimestamp(unix_timestamp, tz=timezone.utc)
+            recorded_timestamp = dt.isoformat()
+        except (ValueError, TypeError, OSError):
+            recorded_timestamp = None
+
+    merged = {**meta, **small_data, "decode_s3_key": decode_key}
+    if recorded_timestamp is not None:
+        merged["recordedTimestamp"] = recorded_timestamp
+    item = convert_floats(merged)
+    item["updatedAt"] = datetime.now(timezone.utc).isoformat()
+    print(f"[decode-and-store] DynamoDB item prepared: {item}")
+    return item
+
+
 @app.post("/decode-and-store/")
 def decode_and_store(full_file_name: str = Body(..., embed=True)):
     """
@@ -1315,169 +1953,14 @@ def decode_and_store(full_file_name: str = Body(..., embed=True)):
     """
     print(f"[decode-and-store] Called with full_file_name: {full_file_name}")
     try:
-        # ----------- Download file from S3 -----------
-        print(f"[decode-and-store] Downloading file from S3: {full_file_name}")
-        s3_obj = s3_client.get_object(Bucket=S3_BUCKET, Key=full_file_name)
-        file_bytes = s3_obj["Body"].read()
-        print(f"[decode-and-store] Downloaded {len(file_bytes)} bytes from S3.")
-
-        # ----------- Parse filename -----------
-        def parse_custom_filename(fname):
-            parts = fname.split("__")
-            device = parts[0] if len(parts) > 0 else "none"
-            timestamp = parts[1] if len(parts) > 1 else "none"
-            experiment_name = parts[2] if len(parts) > 2 else "none"
-            shimmer_field = parts[3] if len(parts) > 3 else "none"
-            filename = parts[5] if len(parts) > 5 else "none"
-
-            shimmer_device = shimmer_field
-            shimmer_day = "none"
-            if shimmer_field != "none" and "-" in shimmer_field:
-                shimmer_device, shimmer_day = shimmer_field.rsplit("-", 1)
-
-            ext, part = "", None
-            if filename and "." in filename:
-                ext = filename.split(".")[-1]
-                part = filename.split(".")[0]
-            elif filename:
-                part = filename
-
-            date, time = "none", "none"
-            if timestamp and "_" in timestamp:
-                ymd, hms = timestamp.split("_", 1)
-                if len(ymd) == 8 and len(hms) == 6:
-                    date = f"{ymd[:4]}-{ymd[4:6]}-{ymd[6:8]}"
-                    time = f"{hms[:2]}:{hms[2:4]}:{hms[4:6]}"
-
-            return {
-                "full_file_name": fname,
-                "device": device,
-                "timestamp": timestamp,
-                "date": date,
-                "time": time,
-                "experiment_name": experiment_name,
-                "shimmer_device": shimmer_device,
-                "shimmer_day": shimmer_day,
-                "filename": filename,
-                "ext": ext,
-                "part": part
-            }
-
-        meta = parse_custom_filename(full_file_name)
-        print(f"[decode-and-store] Parsed filename meta: {meta}")
-
-        # ----------- Patient mapping -----------
-        patient = None
-        try:
-            mapping_table_name = os.getenv("DDB_TABLE")
-            if mapping_table_name and meta.get("device"):
-                ddb = boto3.resource("dynamodb")
-                mapping_table = ddb.Table(mapping_table_name)
-                resp = mapping_table.get_item(Key={"device": meta["device"]})
-                patient = resp.get("Item", {}).get("patient")
-                print(f"[decode-and-store] Patient mapping found: {patient}")
-        except Exception as e:
-            print(f"[decode-and-store] Error in patient mapping: {e}")
-            patient = None
-        if patient:
-            meta["patient"] = patient
-
-        # ----------- Decode shimmer data -----------
-        print(f"[decode-and-store] Decoding shimmer data...")
-        decoded = read_shimmer_dat(file_bytes)
-        print(f"[decode-and-store] Decoded keys: {list(decoded.keys())}")
-
-        # ----------- Remove unneeded heavy keys (just in case)
-        EXCLUDE_KEYS = {
-            "timestamp", "headerInfo", "headerBytes", "channelNames", "packetLengthBytes",
-            "Accel_LN_X", "Accel_LN_Y", "Accel_LN_Z", "VSenseBatt", 
-            "Gyro_X", "Gyro_Y", "Gyro_Z",
-            "Accel_WR_X", "Accel_WR_Y", "Accel_WR_Z",
-            "Mag_X", "Mag_Y", "Mag_Z",
-            "Accel_WR_y"  # in case of typo variant
-        }
-
-        # ----------- Separate large vs small data -----------
-        large_data, small_data = {}, {}
-        for k, v in decoded.items():
-            if k in EXCLUDE_KEYS:
-                continue
-            if isinstance(v, (list, dict)) and len(str(v)) > 2000:
-                large_data[k] = v
-            else:
-                small_data[k] = v
-
-        # Always include sampleRate in both small_data and large_data
-        if "sampleRate" in decoded:
-            try:
-                sr = round(float(decoded["sampleRate"]), 2)
-                small_data["sampleRate"] = sr
-                large_data["sampleRate"] = sr
-            except Exception:
-                pass
-
-        print(f"[decode-and-store] Large data keys: {list(large_data.keys())}")
-        print(f"[decode-and-store] Small data keys: {list(small_data.keys())}")
-
-        # ----------- Store large data to S3 using presigned URL -----------
-        import json
-        decode_key = f"decode/{os.path.splitext(full_file_name)[0]}_decoded.json"
-        presigned_url = s3_client.generate_presigned_url(
-            ClientMethod="put_object",
-            Params={"Bucket": S3_BUCKET, "Key": decode_key, "ContentType": "application/json"},
-            ExpiresIn=600
-        )
-        print(f"[decode-and-store] Presigned URL for decoded upload: {presigned_url}")
-        try:
-            import requests
-            resp = requests.put(
-                presigned_url,
-                data=json.dumps(large_data),
-                headers={"Content-Type": "application/json"}
-            )
-            print(f"[decode-and-store] S3 upload response status: {resp.status_code}")
-            if resp.status_code not in [200, 201]:
-                print(f"[decode-and-store] S3 upload error: {resp.text}")
-                return {"error": f"Failed to upload decoded file to S3: {resp.text}"}
-        except ImportError:
-            print("[decode-and-store] requests library is not installed.")
-            return {"error": "requests library is required for presigned URL upload. Please install it."}
-
-        # ----------- Prepare DynamoDB record -----------
-        def convert_floats(obj):
-            from decimal import Decimal
-            if isinstance(obj, float):
-                return Decimal(str(obj))
-            if isinstance(obj, dict):
-                return {k: convert_floats(v) for k, v in obj.items()}
-            if isinstance(obj, list):
-                return [convert_floats(v) for v in obj]
-            return obj
-
-        # Extract recordedTimestamp from first timestampCal value
-        recorded_timestamp = None
-        if "timestampCal" in decoded and isinstance(decoded["timestampCal"], list) and len(decoded["timestampCal"]) > 0:
-            try:
-                unix_timestamp = float(decoded["timestampCal"][0])
-                dt = datetime.fromtimestamp(unix_timestamp, tz=timezone.utc)
-                recorded_timestamp = dt.isoformat()
-            except (ValueError, TypeError, OSError):
-                recorded_timestamp = None
-
-        merged = {**meta, **small_data, "decode_s3_key": decode_key}
-        if recorded_timestamp is not None:
-            merged["recordedTimestamp"] = recorded_timestamp
-        item = convert_floats(merged)
-        item["updatedAt"] = datetime.now(timezone.utc).isoformat()
-        print(f"[decode-and-store] DynamoDB item prepared: {item}")
+        item = _decode_file_item(full_file_name)
 
         # ----------- Save to DynamoDB -----------
         file_table_name = os.getenv("DDB_FILE_TABLE")
         if not file_table_name:
             print("[decode-and-store] DDB_FILE_TABLE env not set")
             return {"error": "DDB_FILE_TABLE env not set"}
-        ddb = boto3.resource("dynamodb")
-        file_table = ddb.Table(file_table_name)
+        file_table = _ddb_table(file_table_name)
         file_table.put_item(Item=item)
         print(f"[decode-and-store] Item stored in DynamoDB table: {file_table_name}")
 
@@ -1486,34 +1969,100 @@ def decode_and_store(full_file_name: str = Body(..., embed=True)):
             "filename": full_file_name,
             "message": "Decode and store successful",
             "ddb_item": item,
-            "decode_s3_key": decode_key
+            "decode_s3_key": item["decode_s3_key"]
         }
 
     except (BotoCoreError, ClientError, Exception) as e:
         print(f"[decode-and-store] Exception: {e}")
         return {"error": str(e)}
 
+@app.post("/decode-and-store/bulk/")
+def decode_and_store_bulk(full_file_names: List[str] = Body(..., embed=True)):
+    """
+    /decode-and-store/ for many files at once. Files are fetched and decoded
+    concurrently, and their items are written 25 per BatchWriteItem (unprocessed
+    items retried) instead of one PutItem each. Per-file failures are reported
+    under 'errors' without stopping the rest. If a batch write fails, 'stored'
+    still lists the files whose batches completed and 'uncertain' lists the ones
+    in the failed batch, which may or may not have been written.
+    """
+    file_table_name = os.getenv("DDB_FILE_TABLE")
+    if not file_table_name:
+        return {"error": "DDB_FILE_TABLE env not set"}
+    # A batch may not hold two writes for the same key
+    names = list(dict.fromkeys(full_file_names))
+
+    def decode_one(name):
+        try:
+            return name, _decode_file_item(name), None
+        except Exception as e:
+            print(f"[decode-and-store] Exception for {name}: {e}")
+            return name, None, str(e)
+
+    stored: List[str] = []
+    errors: Dict[str, str] = {}
+    # Decoded but not yet confirmed written: (names, items) of the batch being filled
+    pending_names: List[str] = []
+    pending_items: List[Dict] = []
+
+    def flush():
+        _batch_put_items(file_table_name, pending_items)
+        stored.extend(pending_names)
+        pending_names.clear()
+        pending_items.clear()
+
+    try:
+        # Decoding fans out; writes go out from this thread as each batch fills
+        with ThreadPoolExecutor(max_workers=DDB_WRITE_WORKERS) as ex:
+            for name, item, err in ex.map(decode_one, names):
+                if err is not None:
+                    errors[name] = err
+                    continue
+                pending_names.append(name)
+                pending_items.append(item)
+                if len(pending_items) == 25:
+                    flush()
+            if pending_items:
+                flush()
+    except (BotoCoreError, ClientError) as e:
+        return {"error": str(e), "stored": stored, "uncertain": list(pending_names), "errors": errors}
+
+    return {
+        "message": f"Decoded and stored {len(stored)} of {len(names)} files",
+        "stored": stored,
+        "errors": errors,
+    }
+
 @app.get("/get-decoded-field-direct/")
 def get_decoded_field_direct(
     full_file_name: str = Query(...),
     field_name: str = Query(...)
 ):
     """
-    Directly fetches the field from 'decode/{filename_without_ext}_decoded.json' in S3,
-    skipping DynamoDB lookup.
+    Directly fetches the field from 'decode/{filename_without_ext}_fields/{field}'
+    in S3, skipping DynamoDB lookup. Files decoded before per-field objects existed
+    fall back to 'decode/{filename_without_ext}_decoded.json'.
     """
     try:
-        import json, os
-        decoded_key = f"decode/{os.path.splitext(full_file_name)[0]}_decoded.json"
-        s3_obj = s3_client.get_object(Bucket=S3_BUCKET, Key=decoded_key)
-        decoded_data = json.loads(s3_obj["Body"].read().decode("utf-8"))
-        if field_name not in decoded_data:
-            raise HTTPException(status_code=404, detail=f"Field '{field_name}' not found.")
+        # Report whichever object the values were actually read from
+        decoded_key = _decoded_field_key(full_file_name, field_name)
+        try:
+            s3_obj = s3_client.get_object(Bucket=S3_BUCKET, Key=decoded_key)
+            values = _decode_decoded_field(s3_obj["Body"].read(), s3_obj.get("Metadata", {}).get("typecode"))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                raise
+            decoded_key = f"decode/{os.path.splitext(full_file_name)[0]}_decoded.json"
+            s3_obj = s3_client.get_object(Bucket=S3_BUCKET, Key=decoded_key)
+            decoded_data = _json_loads(s3_obj["Body"].read())
+            if field_name not in decoded_data:
+                raise HTTPException(status_code=404, detail=f"Field '{field_name}' not found.")
+            values = decoded_data[field_name]
         return {
             "decode_s3_key": decoded_key,
             "field": field_name,
-            "length": len(decoded_data[field_name]),
-            "values": decoded_data[field_name]
+            "length": len(values),
+            "values": values
         }
     except (BotoCoreError, ClientError, Exception) as e:
         raise HTTPException(status_code=500, detail=str(e))